@@ -7,6 +7,9 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from app.stores import OTPStore, ListingCache
+from app.dispatch import OTPDispatcher
+from app.metrics import Metrics
 
 import os
 from dotenv import load_dotenv
@@ -19,6 +22,10 @@ db = SQLAlchemy()
 migrate = Migrate()
 login = LoginManager()
 limiter = Limiter(key_func=get_remote_address)
+otp_store = OTPStore()
+otp_dispatcher = OTPDispatcher()
+listing_cache = ListingCache()
+metrics = Metrics()
 login.login_message =('Please log in to access this page.')
 
 
@@ -29,7 +36,8 @@ def create_app(config_class=Config):
     db.init_app(app)
     import os
     jwt = JWTManager(app)
-    migrate.init_app(app, db)  
+    from app.triggers import include_object
+    migrate.init_app(app, db, include_object=include_object)
     jwt.init_app(app)
     login.init_app(app)
     from app.models import User
@@ -40,6 +48,10 @@ def create_app(config_class=Config):
         return db.session.get(User, int(user_id))
 
     limiter.init_app(app)
+    otp_store.init_app(app)
+    otp_dispatcher.init_app(app)
+    listing_cache.init_app(app)
+    metrics.init_app(app)
 
 
     from app.auth import bp as auth_bp
@@ -48,6 +60,9 @@ def create_app(config_class=Config):
     from app.main import bp as main_bp
     app.register_blueprint(main_bp, url_prefix='/api')
 
+    from app.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)
+
     CORS(app,
         resources={r"/*": {"origins": ["http://127.0.0.1:5500"]}},
         allow_headers=["Content-Type", "Authorization"],
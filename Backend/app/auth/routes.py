@@ -5,14 +5,18 @@ from app import db
 from app.auth import bp
 from app.models import User
 from functools import wraps
-from app.auth.schema import MobileLoginSchema,EmailLoginSchema, OtpSchema
+from app.auth.schema import MobileLoginSchema,EmailLoginSchema, OtpSchema, PreferencesSchema
+from flask_login import login_required, current_user
 from random import randint
-from app.utils import send_email,send_sms#, generate_jwt # temp email sending logic
+from app.utils import send_email,send_sms,sms_delivered#, generate_jwt # temp email sending logic
 from datetime import datetime, timedelta
 from app import limiter
 from flask_limiter.errors import RateLimitExceeded
-from flask import render_template
-otp_store = {}
+from flask import render_template, current_app
+from app import otp_store, otp_dispatcher
+from app.outbox import enqueue_email, enqueue_sms
+import secrets
+import time
 
 # def otp_required(f):
 #     @wraps(f)
@@ -36,10 +40,46 @@ def send_otp_email(to_email, otp_code):
 def send_otp_sms(to_number, otp_code):
     sms_text = render_template("otp_sms.txt", otp=otp_code)
     
-    send_sms(
+    result = send_sms(
         to_number=to_number,
         message_text=sms_text
     )
+    if not sms_delivered(result):
+        raise RuntimeError(f"Failed to send SMS: {result.get('error')}")
+
+def submit_otp(identifier, send, otp):
+    """Hand an OTP to the outbox when OUTBOX_ENABLED, else to the dispatcher pool.
+
+    Returns the opaque request id its delivery status is polled by, or None
+    when the dispatcher is too busy to take it.
+    """
+    # Polled without signing in, so the status must not be findable by contact
+    request_id = secrets.token_urlsafe(16)
+    if not current_app.config["OUTBOX_ENABLED"]:
+        return request_id if otp_dispatcher.submit(request_id, send, identifier, otp) else None
+    # No point delivering a code after it stopped working
+    expires_at = datetime.now() + timedelta(seconds=current_app.config["OTP_TTL_SECONDS"])
+    if send is send_otp_email:
+        enqueue_email({
+            "to": identifier,
+            "subject": "Duemate Sign In",
+            "html": render_template("otp_email.html", otp=otp),
+            "text": f"Your OTP is: {otp}",
+        }, status_key=request_id, expires_at=expires_at)
+    else:
+        enqueue_sms(identifier, render_template("otp_sms.txt", otp=otp), status_key=request_id,
+                    expires_at=expires_at)
+    db.session.commit()
+    otp_store.set_status(request_id, "queued")
+    return request_id
+
+def busy_response():
+    response = jsonify({
+        "status": "fail",
+        "message": "OTP service is busy. Try again shortly."
+    })
+    response.headers["Retry-After"] = "5"
+    return response, 503
 
 @bp.errorhandler(RateLimitExceeded)
 def ratelimit_handler(e):
@@ -66,7 +106,7 @@ def login():
         except ValidationError as e:
             return jsonify({
                 "status": "fail",
-                "errors": e.errors()
+                "errors": e.errors(include_context=False)
             }), 400
 
         user = db.session.scalar(sa.select(User).where(User.email == data.email))
@@ -77,24 +117,19 @@ def login():
 
         otp = str(randint(100000, 999999))
 
-        otp_store[data.email] = {
-            'otp': otp,
-            'time': datetime.now()
-        }
-
-        try:
-            send_otp_email(data.email, otp)
-        except Exception:
-            return jsonify({
-                "status": "fail",
-                "message": "Failed to send OTP"
-            }), 500
+        otp_store.set(data.email, otp)
 
+        request_id = submit_otp(data.email, send_otp_email, otp)
+        if not request_id:
+            otp_store.pop(data.email)
+            return busy_response()
 
         return jsonify({
             "status": "success",
-            "message": f"OTP sent to {data.email}"
-        }), 200
+            "message": f"OTP is being sent to {data.email}",
+            "delivery": "queued",
+            "request_id": request_id
+        }), 202
 
     elif phone_number:
         try:
@@ -102,7 +137,7 @@ def login():
         except ValidationError as e:
             return jsonify({
                 "status": "fail",
-                "errors": e.errors()
+                "errors": e.errors(include_context=False)
             }), 400
 
         user = db.session.scalar(sa.select(User).where(User.phone_number == data.phone_number))
@@ -113,24 +148,19 @@ def login():
 
         otp = str(randint(100000, 999999))
 
-       
-        otp_store[data.phone_number] = {
-            'otp': otp,
-            'time': datetime.now()
-        }
+        otp_store.set(data.phone_number, otp)
 
-        try:
-            send_sms(data.phone_number, otp)
-        except Exception:
-            return jsonify({
-                "status": "fail",
-                "message": "Failed to send OTP"
-            }), 500
+        request_id = submit_otp(data.phone_number, send_otp_sms, otp)
+        if not request_id:
+            otp_store.pop(data.phone_number)
+            return busy_response()
 
         return jsonify({
             "status": "success",
-            "message": f"OTP sent to {data.phone_number}"
-        }), 200
+            "message": f"OTP is being sent to {data.phone_number}",
+            "delivery": "queued",
+            "request_id": request_id
+        }), 202
 
     else:
         return jsonify({
@@ -139,6 +169,25 @@ def login():
         }), 400
 
 
+@bp.route('/otp_status', methods=['GET'])
+@limiter.limit("30 per minute")
+def otp_status():
+    request_id = request.args.get('request_id')
+
+    if not request_id:
+        return jsonify({"status": "fail", "message": "Provide the 'request_id' returned by login"}), 400
+
+    delivery = otp_store.get_status(request_id)
+
+    if not delivery:
+        return jsonify({"status": "fail", "message": "No OTP delivery found"}), 404
+
+    return jsonify({
+        "status": "success",
+        "delivery": delivery
+    }), 200
+
+
 @bp.route('/verify_otp', methods=['POST'])
 @limiter.limit("3 per minute")
 def verify_otp():
@@ -148,7 +197,7 @@ def verify_otp():
         return jsonify({
             "status": "error", 
             "message": "Invalid input",
-            "errors": e.errors()
+            "errors": e.errors(include_context=False)
         }), 400
     except Exception:
         return jsonify({
@@ -162,7 +211,8 @@ def verify_otp():
     if not identifier:
         return jsonify({"status": "error", "message": "Missing email or phone_number"}), 400
 
-    otp_entry = otp_store.get(identifier)
+    # Every outcome below consumes the OTP, so take it out of the store in one step
+    otp_entry = otp_store.pop(identifier)
 
     if not otp_entry:
         return jsonify({"status": "error", "message": "OTP session not found"}), 400
@@ -171,15 +221,12 @@ def verify_otp():
     otp_created_time = otp_entry.get('time')
 
     if not otp_created_time:
-        otp_store.pop(identifier, None)
         return jsonify({"status": "error", "message": "OTP timestamp missing"}), 400
 
-    if datetime.now() - otp_created_time > timedelta(minutes=5):
-        otp_store.pop(identifier, None)
+    if time.time() - otp_created_time > current_app.config["OTP_TTL_SECONDS"]:
         return jsonify({"status": "error", "message": "OTP expired"}), 403
 
     if entered_otp != stored_otp:
-        otp_store.pop(identifier, None)
         return jsonify({"status": "error", "message": "Invalid OTP"}), 401
 
 
@@ -190,7 +237,6 @@ def verify_otp():
         user = db.session.scalar(sa.select(User).where(User.phone_number == data.phone_number))
 
     if not user:
-        otp_store.pop(identifier, None)
         return jsonify({"status": "error", "message": "User not found"}), 404
 
     # try:
@@ -198,10 +244,34 @@ def verify_otp():
     # except Exception:
     #     return jsonify({"status": "error", "message": "Token generation failed"}), 500
 
-    otp_store.pop(identifier, None) 
-
     return jsonify({
         "status": "success",
         # "access_token": token,
         "user_id": user.id
     }), 200
+
+
+@bp.route('/preferences', methods=['PATCH'])
+@login_required
+def update_preferences():
+    try:
+        data = PreferencesSchema(**request.get_json())
+    except ValidationError as e:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid input",
+            "errors": e.errors(include_context=False)
+        }), 400
+    except Exception:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid JSON"
+        }), 400
+
+    current_user.reminder_digest = data.reminder_digest
+    db.session.commit()
+
+    return jsonify({
+        "status": "success",
+        "reminder_digest": current_user.reminder_digest
+    }), 200
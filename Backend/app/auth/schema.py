@@ -11,6 +11,9 @@ class EmailLoginSchema(BaseModel):
 class MobileLoginSchema(BaseModel):
     phone_number: Annotated[str, Field(..., min_length=10, max_length=13, description="User's 10-digit mobile number")]
 
+class PreferencesSchema(BaseModel):
+    reminder_digest: Optional[bool] = Field(None, description="Group reminders into one message per run; null follows the default")
+
 class OtpSchema(BaseModel):
     otp: Annotated[str, Field(..., min_length=6, max_length=6, pattern=r'^\d{6}$', description="6-digit OTP code")]
     email: Optional[EmailStr] = None
@@ -0,0 +1,192 @@
+import click
+import json
+import logging
+import signal
+import threading
+from datetime import timedelta
+from flask import Blueprint, current_app
+from app.cron.overdue import mark_overdue
+from app.cron.reminders import run_reminders
+from app.cron.scheduler import DeadlineScheduler, change_feed_enabled, set_change_feed
+from app.cron.delivery import DeliveryEngine
+from app.outbox import drain as drain_outbox
+from app.main.summary import rebuild_summary
+from app.main.importer import FORMATS, import_payments, read_rows
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group()
+def cron():
+    """Scheduled maintenance and notification jobs."""
+    pass
+
+
+@cron.command()
+@click.option('--channel', type=click.Choice(['email', 'sms']), multiple=True,
+              help='Channel to send on, repeatable. Defaults to both.')
+@click.option('--full', is_flag=True,
+              help='Rescan whole reminder windows instead of only new entries.')
+@click.option('--digest/--no-digest', default=None,
+              help='One message per user, or one per payment. Defaults to each user\'s preference.')
+def reminders(channel, full, digest):
+    """Send upcoming and overdue payment reminders not sent yet."""
+    summary = run_reminders(channels=channel or ('email', 'sms'), full=full, digest=digest)
+    click.echo(f"Sent {summary['email']} emails and {summary['sms']} SMS covering "
+               f"{summary['payments']} payment reminders, {summary['failed']} failed, "
+               f"{summary['skipped']} already sent.")
+    click.echo(f"Rendered {summary['rendered']} messages at {summary['render_rate']:.0f} messages/s.")
+    echo_delivery(summary['delivery'])
+
+
+def echo_delivery(delivery):
+    for name in ('email', 'sms'):
+        counts = delivery.get(name, {})
+        if 'queued' in counts:
+            click.echo(f"{name}: {counts['queued']} queued in the outbox.")
+            continue
+        click.echo(f"{name}: {counts.get('sent', 0)} delivered, {counts.get('failed', 0)} failed, "
+                   f"{counts.get('retries', 0)} retries over {counts.get('requests', 0)} provider calls, "
+                   f"{counts.get('throttled_seconds', 0):.1f}s throttled.")
+    click.echo(f"Delivered {delivery['messages_per_second']:.1f} messages/s over {delivery['seconds']:.1f}s.")
+
+
+@cron.command()
+@click.option('--batch-size', type=int, default=1000, show_default=True,
+              help='Payments updated per transaction.')
+def overdue(batch_size):
+    """Mark pending payments past their deadline as overdue."""
+    total = 0
+    for batch, changed in enumerate(mark_overdue(batch_size), 1):
+        total += changed
+        click.echo(f"Batch {batch}: {changed} marked overdue ({total} so far).")
+    click.echo(f"Marked {total} payments overdue.")
+
+
+@cron.command()
+@click.option('--channel', type=click.Choice(['email', 'sms']), multiple=True,
+              help='Channel to send on, repeatable. Defaults to both.')
+@click.option('--digest/--no-digest', default=None,
+              help='One message per user, or one per payment. Defaults to each user\'s preference.')
+def scheduler(channel, digest):
+    """Run the reminder scheduler until interrupted."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = current_app.config
+    if not change_feed_enabled():
+        raise click.ClickException("The payment change feed is off, run `flask cron change-feed --on` first.")
+    deadlines = DeadlineScheduler(
+        lookahead=timedelta(hours=config["SCHEDULER_LOOKAHEAD_HOURS"]),
+        poll_interval=config["SCHEDULER_POLL_SECONDS"],
+        gap=config["SCHEDULER_GAP_SECONDS"],
+        channels=channel or ('email', 'sms'),
+        digest=digest,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: deadlines.stop())
+    try:
+        deadlines.run()
+    except KeyboardInterrupt:
+        pass
+    click.echo(f"Stopped: {dict(deadlines.stats)}")
+
+
+@cron.command('change-feed')
+@click.option('--on/--off', 'enabled', default=None, help='Switch the feed. Without it, show its state.')
+def change_feed(enabled):
+    """Show or switch the payment change feed read by the scheduler.
+
+    While on, every payment write queues a payment_change row and only the
+    scheduler deletes them, so keep `flask cron scheduler` running. Switching
+    it off empties the feed.
+    """
+    if enabled is not None:
+        set_change_feed(enabled)
+    click.echo(f"Payment change feed is {'on' if change_feed_enabled() else 'off'}.")
+
+@bp.cli.group()
+def outbox():
+    """Queued outbound email and SMS."""
+    pass
+
+
+@outbox.command()
+@click.option('--once', is_flag=True, help='Exit once nothing is due instead of polling.')
+@click.option('--batch-size', type=int, help='Rows claimed per batch. Defaults to OUTBOX_BATCH_SIZE.')
+def drain(once, batch_size):
+    """Claim due outbox rows in batches and send them."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = current_app.config
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    with DeliveryEngine(current_app._get_current_object()) as engine:
+        try:
+            totals = drain_outbox(
+                engine, once=once, poll_interval=config["OUTBOX_POLL_SECONDS"], stop=stop,
+                batch_size=batch_size or config["OUTBOX_BATCH_SIZE"],
+                lease=timedelta(seconds=config["OUTBOX_LEASE_SECONDS"]),
+                max_attempts=config["OUTBOX_MAX_ATTEMPTS"],
+                backoff=timedelta(seconds=config["OUTBOX_BACKOFF_SECONDS"]),
+            )
+        except KeyboardInterrupt:
+            totals = {}
+        click.echo(f"Sent {totals.get('sent', 0)}, retrying {totals.get('retried', 0)}, "
+                   f"gave up on {totals.get('failed', 0)}.")
+        echo_delivery(engine.summary())
+
+
+@bp.cli.group()
+def payments():
+    """Payment data maintenance."""
+    pass
+
+
+@payments.command('rebuild-summary')
+@click.option('--user-id', type=int, help='Only rebuild this user\'s counters.')
+def rebuild_summary_command(user_id):
+    """Recompute payment_summary counters from the payment table."""
+    rows = rebuild_summary(user_id)
+    click.echo(f"Rebuilt {rows} summary rows.")
+
+
+@payments.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS),
+              help='File format. Defaults to csv for .csv files, ndjson otherwise.')
+@click.option('--chunk-size', type=int, default=5000, show_default=True,
+              help='Rows per INSERT.')
+@click.option('--commit-every', type=int, default=50000, show_default=True,
+              help='Rows per transaction.')
+@click.option('--create-users', is_flag=True,
+              help='Create users for emails and phone numbers not seen before.')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True),
+              help='Write rejected rows with their errors to this NDJSON file.')
+def import_command(path, fmt, chunk_size, commit_every, create_users, errors_path):
+    """Bulk-load payments from a CSV or NDJSON file.
+
+    Every row needs an email or phone_number naming its owner, plus the
+    fields accepted by POST /api/payments.
+    """
+    errors_file = open(errors_path, 'w', encoding='utf-8') if errors_path else None
+    shown = 0
+
+    def on_error(line_number, row, errors):
+        nonlocal shown
+        if errors_file:
+            errors_file.write(json.dumps({"line": line_number, "row": row if isinstance(row, dict) else None,
+                                          "errors": errors}, default=str) + "\n")
+        elif shown < 10:
+            click.echo(f"line {line_number}: {'; '.join(error['msg'] for error in errors)}", err=True)
+            shown += 1
+
+    def on_progress(stats):
+        click.echo(f"{stats['imported']} imported, {stats['rejected']} rejected, "
+                   f"{stats['imported'] / stats['seconds']:.0f} rows/s")
+
+    try:
+        stats = import_payments(read_rows(path, fmt), chunk_size=chunk_size, commit_every=commit_every,
+                                create_users=create_users, on_error=on_error, on_progress=on_progress)
+    finally:
+        if errors_file:
+            errors_file.close()
+    click.echo(f"Imported {stats['imported']} of {stats['read']} rows in {stats['seconds']:.1f}s "
+               f"({stats['imported'] / stats['seconds']:.0f} rows/s), created {stats['users_created']} users, "
+               f"rejected {stats['rejected']}.")
@@ -0,0 +1,173 @@
+import logging
+import random
+import smtplib
+import threading
+import time
+import requests
+from functools import partial
+import resend
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app.utils import deliver_email, group_sms, post_sms_chunk, sms_delivered
+
+logger = logging.getLogger(__name__)
+
+# Gateway answers worth another attempt; anything else is final. A POST is
+# not idempotent, so only answers that say the message was not taken (and
+# connections that never opened) are retried; a 500, 502, 504 or read
+# timeout may follow an accepted message.
+TRANSIENT_SMS_STATUSES = {429, 503, "unreachable"}
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average, in bursts of up to ``burst``.
+
+    acquire() blocks until a token is available; a rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def is_transient(exc):
+    """Whether a provider exception is worth retrying."""
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPException):
+        return isinstance(exc, smtplib.SMTPServerDisconnected)
+    if isinstance(exc, (resend.exceptions.RateLimitError, resend.exceptions.ApplicationError)):
+        return True
+    return isinstance(exc, (OSError, requests.exceptions.RequestException))
+
+
+class DeliveryEngine:
+    """Sends a reminder run's messages on one bounded thread pool per channel.
+
+    Every provider call (SMTP or Resend for email, one gateway request per
+    SMS batch) first takes a token from that provider's bucket, so a run
+    stays inside the provider's quota however many workers are busy.
+    Transient failures are retried up to DELIVERY_MAX_ATTEMPTS times with
+    exponential backoff and full jitter. A failing message never stops the
+    others; it just comes back as an error result. Totals per channel are
+    available from summary().
+    """
+
+    def __init__(self, app, email_provider=None):
+        config = app.config
+        self.app = app
+        self.email_provider = email_provider or config["EMAIL_PROVIDER"]
+        self.max_attempts = config["DELIVERY_MAX_ATTEMPTS"]
+        self.backoff_base = config["DELIVERY_BACKOFF_BASE"]
+        self.backoff_max = config["DELIVERY_BACKOFF_MAX"]
+        self.pools = {
+            "email": ThreadPoolExecutor(config["DELIVERY_EMAIL_WORKERS"], thread_name_prefix="deliver-email"),
+            "sms": ThreadPoolExecutor(config["DELIVERY_SMS_WORKERS"], thread_name_prefix="deliver-sms"),
+        }
+        self.buckets = {
+            "smtp": TokenBucket(config["SMTP_RATE_PER_SECOND"], config["SMTP_BURST"]),
+            "resend": TokenBucket(config["RESEND_RATE_PER_SECOND"], config["RESEND_BURST"]),
+            "sms": TokenBucket(config["SMS_RATE_PER_SECOND"], config["SMS_BURST"]),
+        }
+        self.stats = {"email": Counter(), "sms": Counter()}
+        self._stats_lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def send_emails(self, messages):
+        """Send email dicts in parallel; one result per message, in order."""
+        futures = [
+            self.pools["email"].submit(self._attempt, "email", self.email_provider, 1,
+                                       deliver_email, message, self.email_provider)
+            for message in messages
+        ]
+        results = []
+        for message, future in zip(messages, futures):
+            result = future.result()
+            result.setdefault("to", message["to"])
+            results.append(result)
+        return results
+
+    def send_sms_batch(self, messages):
+        """Same contract as utils.send_sms_batch, with each gateway call in parallel."""
+        rejected, calls = group_sms(messages)
+        futures = [
+            self.pools["sms"].submit(self._attempt, "sms", "sms", len(numbers),
+                                     partial(post_sms_chunk, retry=False), numbers, text)
+            for numbers, text in calls
+        ]
+        self._count("sms", failed=sum(len(result["to"]) for result in rejected))
+
+        results = rejected
+        for (numbers, _), future in zip(calls, futures):
+            result = future.result()
+            result.setdefault("to", numbers)
+            results.append(result)
+        return results
+
+    def _attempt(self, channel, provider, size, send, *args):
+        with self.app.app_context():
+            for attempt in range(1, self.max_attempts + 1):
+                waited = self.buckets[provider].acquire()
+                self._count(channel, requests=1, throttled_seconds=waited)
+                try:
+                    result = send(*args)
+                except Exception as e:
+                    result, transient = {"status": "error", "error": str(e)}, is_transient(e)
+                else:
+                    transient = result.get("status") in TRANSIENT_SMS_STATUSES
+                    if result.get("status") == "success" or sms_delivered(result):
+                        self._count(channel, sent=size)
+                        return result
+
+                if not transient or attempt == self.max_attempts:
+                    break
+                self._count(channel, retries=1)
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                logger.warning("%s delivery attempt %d failed (%s), retrying in %.1fs",
+                               provider, attempt, result.get("error"), delay)
+                time.sleep(delay)
+
+        self._count(channel, failed=size)
+        return result
+
+    def _count(self, channel, **amounts):
+        with self._stats_lock:
+            self.stats[channel].update(amounts)
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        with self._stats_lock:
+            summary = {channel: dict(counts) for channel, counts in self.stats.items()}
+        sent = sum(counts.get("sent", 0) for counts in summary.values())
+        summary["seconds"] = elapsed
+        summary["messages_per_second"] = sent / elapsed if elapsed else 0.0
+        return summary
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
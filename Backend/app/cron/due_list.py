@@ -1,6 +1,90 @@
-from models import Payment
+import heapq
+import itertools
+import sqlalchemy as sa
+import sqlalchemy.orm as so
 from datetime import datetime, timedelta
+from app import db
+from app.models import Payment, User
 
-def get_due_payments():
-    deadline = datetime.now() + timedelta(days=2)
-    return Payment.query.filter(Payment.deadline <= deadline).all()
\ No newline at end of file
+UNPAID = ("pending", "overdue")
+
+# Sorting on user_id + 0 rather than the bare columns keeps the planner on
+# the scan's own deadline or id range: ordered by the plain column it
+# prefers walking ix_payment_user_id_status_deadline user by user.
+KEY_ORDER = (Payment.user_id + 0, Payment.id + 0)
+
+
+def key_page(scan, after=None, limit=10000):
+    """Query for the next ``limit`` ``(user_id, id)`` keys of ``scan`` past ``after``."""
+    query = sa.select(Payment.user_id, Payment.id).where(scan, Payment.status.in_(UNPAID))
+    if after is not None:
+        query = query.where(sa.tuple_(*KEY_ORDER) > after)
+    return query.order_by(*KEY_ORDER).limit(limit)
+
+
+def _scan_keys(scan, page_size):
+    after = None
+    while True:
+        page = [tuple(row) for row in db.session.execute(key_page(scan, after, page_size))]
+        yield from page
+        if len(page) < page_size:
+            return
+        after = page[-1]
+
+
+def _due_keys(scans, page_size):
+    """``(user_id, id)`` of every unpaid payment matching any of ``scans``, in order.
+
+    Each scan is its own range query, read ``page_size`` keys at a time with
+    a keyset on ``(user_id, id)``; the sorted streams are merged and
+    deduplicated, so memory is bounded by the page size, not the due rows.
+    """
+    last = None
+    for key in heapq.merge(*(_scan_keys(scan, page_size) for scan in scans)):
+        if key != last:
+            yield key
+            last = key
+
+
+def iter_due_payments(*scans, lead_time=timedelta(days=2), batch_size=500, key_page_size=10000):
+    """Stream unpaid payments due within ``lead_time`` grouped by user.
+
+    Each of ``scans`` is a criterion run as a separate range query (deadline
+    or id bound), and payments matching any of them are returned; without
+    scans, the ``lead_time`` deadline bound is used. Their ``(user_id, id)``
+    keys are streamed in order, and rows are loaded ``batch_size`` at a time
+    with their user joined in, each chunk yielded as ``{"email": [...],
+    "sms": [...]}`` so both channels are served by the same scan. Chunks are
+    expunged from the session once the caller is done with them.
+    """
+    if not scans:
+        scans = (Payment.deadline <= datetime.now() + lead_time,)
+    keys = _due_keys(scans, key_page_size)
+
+    while True:
+        ids = [payment_id for _, payment_id in itertools.islice(keys, batch_size)]
+        if not ids:
+            return
+        payments = db.session.scalars(
+            sa.select(Payment)
+            .join(Payment.user)
+            .options(so.contains_eager(Payment.user))
+            # Paid since the key scan? Then it is no longer due
+            .where(Payment.id.in_(ids), Payment.status.in_(UNPAID))
+            .order_by(Payment.user_id, Payment.id)
+        ).all()
+        if not payments:
+            continue
+
+        # Read before yielding, the caller may commit and expire these rows
+        users = {p.user for p in payments}
+
+        yield {
+            "email": [p for p in payments if p.user.email],
+            "sms": [p for p in payments if p.user.phone_number],
+        }
+
+        for user in users:
+            db.session.expunge(user)
+        for payment in payments:
+            db.session.expunge(payment)
@@ -0,0 +1,39 @@
+import sqlalchemy as sa
+from datetime import datetime
+from app import db
+from app.models import Payment
+
+
+def mark_overdue(batch_size=1000, now=None):
+    """Flip pending payments past their deadline to overdue, one batch at a time.
+
+    Each batch seeks the next ``batch_size`` candidates through
+    ix_payment_status_deadline (status = 'pending' AND deadline < now) and
+    updates exactly those ids, committing before moving on so locks are only
+    held for one batch. Flipped rows leave the index range, so the next seek
+    starts at the remaining candidates and a run with nothing due costs one
+    empty index probe. Yields the number of rows changed per batch; rows
+    changed concurrently are simply skipped by the WHERE clause.
+    """
+    now = now or datetime.now()
+    is_due = sa.and_(Payment.status == "pending", Payment.deadline < now)
+
+    while True:
+        ids = db.session.scalars(
+            sa.select(Payment.id)
+            .where(is_due)
+            .order_by(Payment.deadline)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return
+
+        result = db.session.execute(
+            sa.update(Payment)
+            .where(is_due, Payment.id.in_(ids))
+            .values(status="overdue")
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        yield result.rowcount
@@ -1,32 +1,278 @@
-from services.payment_service import get_due_payments
-from utils.email_utils import send_email, send_SMS
-from Flask import render_template
-from datetime import datetime
+import sqlalchemy as sa
+from itertools import groupby
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.cron.due_list import UNPAID, iter_due_payments
+from app.models import Payment, ReminderLog, ReminderRetry, ReminderWatermark
+from app.cron.delivery import DeliveryEngine
+from app.outbox import OutboxWriter
+from app.cron.rendering import RenderPool, format_amount, format_deadline
+from app.utils import sms_delivered
+from flask import current_app
+from datetime import datetime, timedelta
 
+LEAD_TIME = timedelta(days=2)
 
-def run_email_reminders():
-    due_payments = get_due_payments()
-    for payment in due_payments:
-        user = payment.user
-        if not user.email or (datetime.now().date() - payment.deadline.date() ==1):
+# A payment enters "upcoming" LEAD_TIME before its deadline and "overdue" at it
+WINDOWS = {"upcoming": LEAD_TIME, "overdue": timedelta(0)}
+
+CONTACT_FIELDS = {"email": "email", "sms": "phone_number"}
+
+
+def _reminder_context(payment, overdue):
+    # Formatted once per payment and shared by every channel and template
+    return {
+        "payment_name": payment.payment_name,
+        "amount": format_amount(payment.amount),
+        "deadline": format_deadline(payment.deadline.date()),
+        "overdue": overdue,
+    }
+
+
+def _reminder_item(payment, now):
+    # Copied out of the ORM objects so items outlive the per-batch commit
+    overdue = payment.deadline <= now
+    return {
+        "payment_id": payment.id,
+        "user_id": payment.user_id,
+        "window": "overdue" if overdue else "upcoming",
+        "email": payment.user.email,
+        "phone_number": payment.user.phone_number,
+        "digest": payment.user.reminder_digest,
+        "context": _reminder_context(payment, overdue),
+    }
+
+
+def _window_scans(window, watermark, now, full=False, max_id=None):
+    """Criteria for the scans that find payments newly inside ``window``.
+
+    One scan covers deadlines that crossed into the window since
+    ``scanned_until``, the other payments created since ``last_payment_id``
+    that were already inside it, up to ``max_id``. Each one is a range on
+    its own index (ix_payment_status_deadline or the primary key) and is run
+    as a separate query. Without a watermark the last run is assumed to have
+    been LEAD_TIME ago; ``full`` rescans the whole window.
+    """
+    offset = WINDOWS[window]
+    bounds = [Payment.deadline <= now + offset]
+    if window == "upcoming":
+        bounds.append(Payment.deadline > now)
+
+    if full:
+        return [bounds]
+    if watermark is None:
+        return [bounds + [Payment.deadline > now - LEAD_TIME + offset]]
+    # Bounding the id range on both ends lets the planner prefer the primary
+    # key over the open-ended deadline bound of the overdue window
+    new_ids = [Payment.id > watermark.last_payment_id]
+    if max_id is not None:
+        new_ids.append(Payment.id <= max_id)
+    return [
+        bounds + [Payment.deadline > watermark.scanned_until + offset],
+        bounds + new_ids,
+    ]
+
+
+def _user_chunks(batches, now):
+    """Regroup keyset batches into item lists that never split a user.
+
+    Batches are ordered by ``(user_id, id)``, so only the last user of a
+    batch can continue into the next one; their items are held back until
+    then, which lets a digest cover all of a user's payments.
+    """
+    carry = []
+    for batch in batches:
+        payments = {p.id: p for p in batch["email"] + batch["sms"]}.values()
+        items = carry + [_reminder_item(p, now)
+                         for p in sorted(payments, key=lambda p: (p.user_id, p.id))]
+        if not items:
             continue
-        
-        send_email(
-            to=user.email,
-            subject="Payment Reminder",
-            html = render_template("reminder_mail.html",amount = payment.amount ,deadline=payment.deadline.strftime("%B %d, %Y"),overdue=datetime.now().date() > payment.deadline.date()),
-            text=render_template("reminder.txt",amount = payment.amount,deadline=payment.deadline.strftime("%B %d, %Y"),overdue=datetime.now().date() > payment.deadline.date())
+        last_user = items[-1]["user_id"]
+        split = next(i for i, item in enumerate(items) if item["user_id"] == last_user)
+        if split:
+            yield items[:split]
+        carry = items[split:]
+    if carry:
+        yield carry
+
+
+def _unsent(items, channel, summary):
+    items = [item for item in items if item[CONTACT_FIELDS[channel]]]
+    if not items:
+        return []
+    done = set(db.session.execute(
+        sa.select(ReminderLog.payment_id, ReminderLog.window).where(
+            ReminderLog.channel == channel,
+            ReminderLog.payment_id.in_([item["payment_id"] for item in items]),
         )
+    ).tuples())
+    fresh = [item for item in items if (item["payment_id"], item["window"]) not in done]
+    summary["skipped"] += len(items) - len(fresh)
+    return fresh
 
-def run_SMS_reminders():
-    due_payments = get_due_payments()
-    for payment in due_payments:
-        user = payment.user
-        if not user.phone_number or (datetime.now().date() - payment.deadline.date() ==1):
+
+def _group_messages(items, digest):
+    """One message per user for digest users, one per payment for everyone else."""
+    messages = []
+    for _, user_items in groupby(items, key=lambda item: item["user_id"]):
+        user_items = list(user_items)
+        wants_digest = digest if digest is not None else bool(user_items[0]["digest"])
+        if wants_digest:
+            messages.append(user_items)
+        else:
+            messages.extend([item] for item in user_items)
+    return messages
+
+
+def _ledger_rows(items, channel, now):
+    return [{"payment_id": item["payment_id"], "window": item["window"],
+             "channel": channel, "sent_at": now} for item in items]
+
+
+def _send_email_reminders(items, digest, now, summary, renderer, engine):
+    messages = _group_messages(_unsent(items, "email", summary), digest)
+    results = engine.send_emails(renderer.render("email", messages))
+
+    rows, failed = [], set()
+    for message, result in zip(messages, results):
+        if result["status"] == "error":
+            summary["failed"] += 1
+            failed.update(item["payment_id"] for item in message)
             continue
-        
-        send_SMS(
-            to=user.phone_number,
-            text=render_template("reminder.txt",amount = payment.amount,deadline=payment.deadline.strftime("%B %d, %Y"),overdue=datetime.now().date() > payment.deadline.date())
-        )
+        summary["email"] += 1
+        rows += _ledger_rows(message, "email", now)
+    return rows, failed
+
+
+def _send_sms_reminders(items, digest, now, summary, renderer, engine):
+    messages = _group_messages(_unsent(items, "sms", summary), digest)
+    numbers = [message[0]["phone_number"] for message in messages]
+    texts = list(zip(numbers, renderer.render("text", messages)))
+
+    by_number = {}
+    for number, message in zip(numbers, messages):
+        by_number.setdefault(number, []).extend(message)
+
+    delivered, failed = set(), set()
+    for result in engine.send_sms_batch(texts):
+        if sms_delivered(result) or result["status"] == "queued":
+            summary["sms"] += len(result["to"])
+            delivered.update(result["to"])
+        else:
+            summary["failed"] += len(result["to"])
+            failed.update(result["to"])
+
+    # Results are grouped by text, not payment, so a number with any failed
+    # message keeps all its payments for the next run
+    rows = []
+    for number in delivered - failed:
+        rows += _ledger_rows(by_number[number], "sms", now)
+    return rows, {item["payment_id"] for number in failed for item in by_number[number]}
 
+
+def _insert_new(model, rows):
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    db.session.execute(insert(model).on_conflict_do_nothing(), rows)
+
+
+def _record_sent(rows):
+    if not rows:
+        return
+    # Two overlapping runs may both send; the ledger still keeps a single row
+    _insert_new(ReminderLog, rows)
+
+
+def _record_failed(items, failed):
+    """Keep failed payments in reminder_retry and drop the ones now handled."""
+    handled = {item["payment_id"] for item in items} - failed
+    if handled:
+        db.session.execute(sa.delete(ReminderRetry).where(ReminderRetry.payment_id.in_(handled)))
+    if failed:
+        _insert_new(ReminderRetry, [{"payment_id": payment_id} for payment_id in failed])
+
+
+def _deliver(scans, now, channels, digest):
+    """Send and record reminders for the unpaid payments matching any of ``scans``."""
+    summary = {"email": 0, "sms": 0, "payments": 0, "failed": 0, "skipped": 0}
+
+    renderer = RenderPool(current_app.config["REMINDER_RENDER_WORKERS"],
+                          current_app.config["REMINDER_RENDER_MIN_PARALLEL"])
+    # With the outbox on, messages are queued in the same commit as their ledger rows
+    if current_app.config["OUTBOX_ENABLED"]:
+        engine = OutboxWriter()
+    else:
+        engine = DeliveryEngine(current_app._get_current_object())
+    with renderer, engine:
+        for items in _user_chunks(iter_due_payments(*scans), now):
+            sent, failed = [], set()
+            if "email" in channels:
+                rows, failed_ids = _send_email_reminders(items, digest, now, summary, renderer, engine)
+                sent += rows
+                failed |= failed_ids
+            if "sms" in channels:
+                rows, failed_ids = _send_sms_reminders(items, digest, now, summary, renderer, engine)
+                sent += rows
+                failed |= failed_ids
+
+            _record_sent(sent)
+            _record_failed(items, failed)
+            db.session.commit()
+            summary["payments"] += len(sent)
+
+    summary["rendered"] = renderer.rendered
+    summary["render_rate"] = renderer.rate
+    summary["delivery"] = engine.summary()
+    return summary
+
+
+def run_reminders(channels=("email", "sms"), full=False, digest=None):
+    """Send each (payment, window, channel) reminder at most once.
+
+    Only payments that newly entered a window since the watermarks stored in
+    reminder_watermark are scanned, and reminder_log filters out anything
+    already sent. Payments whose send failed are kept in reminder_retry and
+    rescanned by every run until they go out (or stop being unpaid);
+    ``full=True`` rescans whole windows.
+
+    ``digest`` forces one message per user (True) or one per payment
+    (False); left as None, each user's ``reminder_digest`` preference decides.
+    """
+    now = datetime.now()
+    max_id = db.session.scalar(sa.select(sa.func.max(Payment.id))) or 0
+
+    # Retries for payments paid or cancelled since their failed send
+    db.session.execute(sa.delete(ReminderRetry).where(sa.exists().where(
+        Payment.id == ReminderRetry.payment_id, Payment.status.not_in(UNPAID))))
+
+    # Both windows in one pass, so a digest can mix due and overdue bills
+    scans = [
+        sa.and_(*criteria)
+        for window in WINDOWS
+        for criteria in _window_scans(window, db.session.get(ReminderWatermark, window), now, full, max_id)
+    ]
+    scans.append(Payment.id.in_(sa.select(ReminderRetry.payment_id)))
+    summary = _deliver(scans, now, channels, digest)
+
+    for window in WINDOWS:
+        db.session.merge(ReminderWatermark(window=window, scanned_until=now, last_payment_id=max_id))
+    db.session.commit()
+
+    return summary
+
+
+def send_reminders(payment_ids, channels=("email", "sms"), digest=None):
+    """Send the reminders now due for ``payment_ids``, as fired by the scheduler.
+
+    Each payment gets the window its deadline puts it in at call time, and the
+    same reminder_log as the cron applies, so the two can run side by side.
+    """
+    return _deliver([Payment.id.in_(payment_ids)], datetime.now(), channels, digest)
+
+
+def run_email_reminders():
+    return run_reminders(channels=("email",))
+
+
+def run_SMS_reminders():
+    return run_reminders(channels=("sms",))
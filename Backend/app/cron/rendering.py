@@ -0,0 +1,136 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+REMINDER_TEMPLATES = (
+    "reminder_mail.html",
+    "reminder.txt",
+    "reminder_digest_mail.html",
+    "reminder_digest.txt",
+)
+
+
+## FORMATTED FIELDS
+# Reminders for the same day share one formatted deadline string
+
+
+@lru_cache(maxsize=1024)
+def format_deadline(day):
+    return day.strftime("%B %d, %Y")
+
+
+def format_amount(amount):
+    return f"{amount:.2f}"
+
+
+## RENDERING
+
+
+class ReminderRenderer:
+    """Reminder templates compiled once into a standalone Jinja environment.
+
+    Unlike render_template this needs no app or request context, so it works
+    from the cron and inside worker processes alike. A message is the list
+    of reminder items built by app.cron.reminders; one item renders with the
+    single-payment templates, several with the digest ones.
+    """
+
+    def __init__(self, template_dir=TEMPLATE_DIR):
+        env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(["html", "htm", "xml"]),
+            auto_reload=False,
+        )
+        self.templates = {name: env.get_template(name) for name in REMINDER_TEMPLATES}
+
+    def text(self, message):
+        if len(message) == 1:
+            return self.templates["reminder.txt"].render(message[0]["context"])
+        return self.templates["reminder_digest.txt"].render(
+            payments=[item["context"] for item in message])
+
+    def email(self, message):
+        if len(message) == 1:
+            context = message[0]["context"]
+            return {
+                "to": message[0]["email"],
+                "subject": "Payment Overdue" if context["overdue"] else "Payment Reminder",
+                "html": self.templates["reminder_mail.html"].render(context),
+                "text": self.templates["reminder.txt"].render(context),
+            }
+        payments = [item["context"] for item in message]
+        return {
+            "to": message[0]["email"],
+            "subject": f"Payment Reminder: {len(payments)} payments due",
+            "html": self.templates["reminder_digest_mail.html"].render(payments=payments),
+            "text": self.templates["reminder_digest.txt"].render(payments=payments),
+        }
+
+
+_worker_renderer = None
+
+
+def _init_worker(template_dir):
+    global _worker_renderer
+    _worker_renderer = ReminderRenderer(template_dir)
+
+
+def _render_chunk(kind, messages):
+    render = getattr(_worker_renderer, kind)
+    return [render(message) for message in messages]
+
+
+class RenderPool:
+    """Renders lists of messages inline, or across worker processes when large.
+
+    Lists of at least ``min_parallel`` messages are split evenly over
+    ``workers`` processes, each holding its own compiled ReminderRenderer;
+    with ``workers=0`` everything renders inline. Rendered counts and time
+    spent are kept so a run can report its throughput.
+    """
+
+    def __init__(self, workers=0, min_parallel=200, template_dir=TEMPLATE_DIR):
+        self.renderer = ReminderRenderer(template_dir)
+        self.workers = workers
+        self.min_parallel = min_parallel
+        self.template_dir = template_dir
+        self.executor = None
+        self.rendered = 0
+        self.seconds = 0.0
+
+    def render(self, kind, messages):
+        start = time.perf_counter()
+        if self.workers and len(messages) >= self.min_parallel:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    self.workers, initializer=_init_worker, initargs=(self.template_dir,))
+            size = -(-len(messages) // self.workers)
+            chunks = [messages[i:i + size] for i in range(0, len(messages), size)]
+            futures = [self.executor.submit(_render_chunk, kind, chunk) for chunk in chunks]
+            rendered = [output for future in futures for output in future.result()]
+        else:
+            render = getattr(self.renderer, kind)
+            rendered = [render(message) for message in messages]
+
+        self.rendered += len(rendered)
+        self.seconds += time.perf_counter() - start
+        return rendered
+
+    @property
+    def rate(self):
+        return self.rendered / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import sqlalchemy as sa
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.cron.reminders import LEAD_TIME, send_reminders
+from app.models import FeatureFlag, Payment, PaymentChange
+
+logger = logging.getLogger(__name__)
+
+UNPAID = ("pending", "overdue")
+
+
+CHANGE_FEED = "change_feed"
+
+
+def change_feed_enabled():
+    return bool(db.session.scalar(sa.select(FeatureFlag.enabled).where(FeatureFlag.name == CHANGE_FEED)))
+
+
+def set_change_feed(enabled):
+    """Switch the payment_change triggers on or off; off also empties the feed."""
+    db.session.merge(FeatureFlag(name=CHANGE_FEED, enabled=enabled))
+    if not enabled:
+        db.session.execute(sa.delete(PaymentChange))
+    db.session.commit()
+
+
+class DeadlineScheduler:
+    """Long-running process that fires payment reminders at their exact lead time.
+
+    Unpaid payments with a deadline up to LEAD_TIME + ``lookahead`` ahead sit
+    in a min-heap keyed by fire time: once LEAD_TIME before the deadline and
+    once at it. The loaded range is extended a step at a time as the clock
+    moves. Writes reach the heap through the payment_change feed filled by
+    triggers, consumed every ``poll_interval`` seconds: each poll deletes a
+    batch of committed feed rows and applies the payment ids it returned.
+    Rows of transactions still in flight are invisible until they commit
+    and are picked up by a later poll, whatever order their ids were handed
+    out in.
+
+    The loaded range is rescanned on start, and again whenever polling has
+    been failing for more than ``gap`` seconds. Feed rows are consumed, so
+    run one scheduler per database. The triggers only write the feed once
+    it is switched on (``flask cron change-feed --on``), and from then on
+    nothing but the scheduler empties it. Reminders go through
+    send_reminders() and the shared reminder_log, so the scheduler and the
+    reminders cron never send the same reminder twice.
+    """
+
+    def __init__(self, lookahead=timedelta(days=1), poll_interval=5, gap=300, batch_size=500,
+                 channels=("email", "sms"), digest=None):
+        self.lookahead = lookahead
+        self.extend_step = lookahead / 24
+        self.poll_interval = poll_interval
+        self.gap = gap
+        self.batch_size = batch_size
+        self.channels = channels
+        self.digest = digest
+        self.stats = Counter()
+        self.stop_event = threading.Event()
+
+        # Heap entries are (fire_at, token, payment_id, last); an entry is live
+        # only while its token is still the payment's current one
+        self._heap = []
+        self._tokens = {}
+        self._counter = itertools.count()
+        self._loaded_until = None
+        self._last_poll = 0.0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    ## HEAP
+
+    def _schedule(self, payment_id, deadline, now):
+        token = next(self._counter)
+        self._tokens[payment_id] = token
+        if deadline > now:
+            heapq.heappush(self._heap, (deadline - LEAD_TIME, token, payment_id, False))
+        heapq.heappush(self._heap, (deadline, token, payment_id, True))
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, token, payment_id, last = heapq.heappop(self._heap)
+            if self._tokens.get(payment_id) != token:
+                continue
+            due.append(payment_id)
+            if last:
+                del self._tokens[payment_id]
+        return list(dict.fromkeys(due))
+
+    ## LOADING
+
+    def _load(self, lower, upper, now):
+        """Schedule unpaid payments with ``lower < deadline <= upper``, keyset by deadline."""
+        last_key = (lower, 0)
+        while True:
+            rows = db.session.execute(
+                sa.select(Payment.id, Payment.deadline)
+                .where(
+                    Payment.status.in_(UNPAID),
+                    Payment.deadline <= upper,
+                    sa.tuple_(Payment.deadline, Payment.id) > sa.tuple_(*last_key),
+                )
+                .order_by(Payment.deadline, Payment.id)
+                .limit(self.batch_size)
+            ).all()
+            if not rows:
+                return
+            for payment_id, deadline in rows:
+                self._schedule(payment_id, deadline, now)
+            last_key = (rows[-1].deadline, rows[-1].id)
+
+    def rescan(self):
+        now = datetime.now()
+        # Changes committed before the scan are already reflected in it
+        db.session.execute(sa.delete(PaymentChange))
+        db.session.commit()
+        self._heap, self._tokens = [], {}
+        self._loaded_until = now + LEAD_TIME + self.lookahead
+        # Same catch-up window as the reminders cron uses on its first run
+        self._load(now - LEAD_TIME, self._loaded_until, now)
+        self._last_poll = time.time()
+        self.stats["rescans"] += 1
+        logger.info("Scheduled %d payments up to %s", len(self), self._loaded_until)
+
+    def _extend(self, now):
+        target = now + LEAD_TIME + self.lookahead
+        if target - self._loaded_until >= self.extend_step:
+            self._load(self._loaded_until, target, now)
+            self._loaded_until = target
+
+    ## CHANGE FEED
+
+    def _consume_changes(self):
+        """Delete up to ``batch_size`` committed feed rows, returning their payment ids.
+
+        SKIP LOCKED keeps PostgreSQL from waiting on rows another session is
+        consuming; SQLite has a single writer and ignores it.
+        """
+        batch = (
+            sa.select(PaymentChange.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        return set(db.session.scalars(
+            sa.delete(PaymentChange)
+            .where(PaymentChange.id.in_(batch.scalar_subquery()))
+            .returning(PaymentChange.payment_id)
+        ).all())
+
+    def _apply_changes(self, now):
+        while True:
+            payment_ids = self._consume_changes()
+            if not payment_ids:
+                db.session.commit()
+                break
+
+            for payment_id in payment_ids:
+                self._tokens.pop(payment_id, None)
+            rows = db.session.execute(
+                sa.select(Payment.id, Payment.deadline).where(
+                    Payment.id.in_(payment_ids),
+                    Payment.status.in_(UNPAID),
+                    Payment.deadline > now - LEAD_TIME,
+                    Payment.deadline <= self._loaded_until,
+                )
+            ).all()
+            for payment_id, deadline in rows:
+                self._schedule(payment_id, deadline, now)
+
+            db.session.commit()
+            self.stats["changes"] += len(payment_ids)
+
+    ## LOOP
+
+    def _fire(self, now):
+        due = self._pop_due(now)
+        for i in range(0, len(due), self.batch_size):
+            summary = send_reminders(due[i:i + self.batch_size], self.channels, self.digest)
+            for key in ("email", "sms", "payments", "failed", "skipped"):
+                self.stats[key] += summary[key]
+            logger.info("Fired %d payments: %d emails, %d SMS, %d failed",
+                        len(due[i:i + self.batch_size]), summary["email"], summary["sms"],
+                        summary["failed"])
+        self.stats["fired"] += len(due)
+
+    def tick(self):
+        if time.time() - self._last_poll > self.gap:
+            logger.warning("Change feed not read for over %ss, rescanning", self.gap)
+            self.rescan()
+        now = datetime.now()
+        self._apply_changes(now)
+        self._last_poll = time.time()
+        self._extend(now)
+        self._fire(now)
+
+    def seconds_until_next(self):
+        if not self._heap:
+            return self.poll_interval
+        wait = (self._heap[0][0] - datetime.now()).total_seconds()
+        return max(0, min(wait, self.poll_interval))
+
+    def run(self):
+        """Schedule and fire reminders until stop() is called."""
+        self.rescan()
+        while not self.stop_event.is_set():
+            try:
+                self.tick()
+            except SQLAlchemyError:
+                # Keep the heap and retry; a long outage ends in a rescan
+                logger.exception("Scheduler tick failed")
+                db.session.rollback()
+            self.stop_event.wait(self.seconds_until_next())
+
+    def stop(self):
+        self.stop_event.set()
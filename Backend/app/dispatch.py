@@ -0,0 +1,57 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class OTPDispatcher:
+    """Sends OTPs on a bounded background pool instead of inside the request.
+
+    At most OTP_DISPATCH_QUEUE_SIZE sends may be queued or running at once;
+    submit() refuses new work beyond that so a slow provider sheds load
+    instead of piling up threads. Delivery status ("queued", "sent" or
+    "failed") is kept in the OTP store under the caller's request id so any
+    worker can answer a poll.
+    """
+
+    def __init__(self, app=None):
+        self.executor = None
+        self.store = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = app.extensions["otp_store"]
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config["OTP_DISPATCH_WORKERS"],
+            thread_name_prefix="otp-dispatch",
+        )
+        self._slots = threading.BoundedSemaphore(app.config["OTP_DISPATCH_QUEUE_SIZE"])
+        app.extensions["otp_dispatcher"] = self
+
+    def submit(self, request_id, send, *args):
+        if not self._slots.acquire(blocking=False):
+            return False
+        self.store.set_status(request_id, "queued")
+        app = current_app._get_current_object()
+        try:
+            self.executor.submit(self._run, app, request_id, send, args)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        return True
+
+    def _run(self, app, request_id, send, args):
+        try:
+            with app.app_context():
+                send(*args)
+            self.store.set_status(request_id, "sent")
+        except Exception:
+            logger.exception("OTP delivery %s failed", request_id)
+            self.store.set_status(request_id, "failed")
+        finally:
+            self._slots.release()
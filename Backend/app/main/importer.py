@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import time
+import sqlalchemy as sa
+from collections import Counter
+from pydantic import ValidationError
+from app import db
+from app.models import Payment, User
+from app.main.schema import NewPaymentSchema
+from app.auth.schema import EmailLoginSchema, MobileLoginSchema
+
+FORMATS = ("csv", "ndjson")
+CONTACT_FIELDS = ("email", "phone_number")
+# A Core insert on the table is one executemany per chunk. The ORM bulk
+# path splits a chunk wherever the set of None values changes.
+PAYMENT_INSERT = sa.insert(Payment.__table__)
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return "csv" if ext == ".csv" else "ndjson"
+
+
+def read_rows(path, fmt=None):
+    """Yield ``(line_number, row)`` from a CSV or NDJSON file, one line at a time."""
+    fmt = fmt or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                # Empty CSV cells mean "not given", same as a missing JSON key
+                yield reader.line_num, {k: v for k, v in row.items() if v not in ("", None)}
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, e
+                    continue
+                yield line_number, row if isinstance(row, dict) else TypeError("Each line must be a JSON object")
+
+
+class UserMap:
+    """Email and phone number to user id, loaded once and kept in memory."""
+
+    def __init__(self, create=False):
+        self.create = create
+        self.created = 0
+        self.ids = {field: {} for field in CONTACT_FIELDS}
+        rows = db.session.execute(
+            sa.select(User.id, User.email, User.phone_number).execution_options(yield_per=10000))
+        for user_id, email, phone_number in rows:
+            if email:
+                self.ids["email"][email] = user_id
+            if phone_number:
+                self.ids["phone_number"][phone_number] = user_id
+
+    def lookup(self, contacts):
+        for field, value in contacts.items():
+            user_id = self.ids[field].get(value)
+            if user_id is not None:
+                return user_id
+        return None
+
+    def resolve(self, row):
+        """Return the row's user id, or None if no known user matches.
+
+        Contacts of new users get the same checks as the login endpoints and
+        raise ValidationError when they fail them.
+        """
+        given = {field: row[field] for field in CONTACT_FIELDS if row.get(field)}
+        user_id = self.lookup(given)
+        if user_id is not None or not given or not self.create:
+            return user_id
+
+        contacts = {}
+        if "email" in given:
+            contacts["email"] = EmailLoginSchema(email=given["email"]).email
+        if "phone_number" in given:
+            contacts["phone_number"] = MobileLoginSchema(phone_number=given["phone_number"]).phone_number
+        # The validated email may be normalized to one already known
+        user_id = self.lookup(contacts)
+        if user_id is None:
+            user = User(**contacts)
+            db.session.add(user)
+            db.session.flush()
+            user_id = user.id
+            self.created += 1
+            for field, value in contacts.items():
+                self.ids[field][value] = user_id
+        # Later rows may spell the contact the same unnormalized way
+        for field, value in contacts.items():
+            if self.ids[field].get(value) == user_id:
+                self.ids[field][given[field]] = user_id
+        return user_id
+
+
+def import_payments(rows, chunk_size=5000, commit_every=50000, create_users=False,
+                    on_error=None, on_progress=None):
+    """Validate and insert payment rows streamed from ``rows``.
+
+    Each row names its owner by ``email`` or ``phone_number`` and otherwise
+    has the fields of NewPaymentSchema. Valid rows are inserted
+    ``chunk_size`` at a time with a single executemany, and committed every
+    ``commit_every`` rows, so memory stays flat and a failure only loses the
+    uncommitted tail. Invalid rows are skipped and passed to
+    ``on_error(line_number, row, errors)``; ``on_progress(stats)`` runs
+    after each commit. Returns the final counts.
+    """
+    users = UserMap(create=create_users)
+    stats = Counter()
+    started = time.perf_counter()
+    chunk = []
+    uncommitted = 0
+
+    def flush():
+        nonlocal chunk, uncommitted
+        if chunk:
+            db.session.execute(PAYMENT_INSERT, chunk)
+            uncommitted += len(chunk)
+            stats["imported"] += len(chunk)
+            chunk = []
+
+    def commit():
+        nonlocal uncommitted
+        flush()
+        db.session.commit()
+        uncommitted = 0
+        stats["users_created"] = users.created
+        stats["seconds"] = time.perf_counter() - started
+        if on_progress:
+            on_progress(stats)
+
+    try:
+        for line_number, row in rows:
+            stats["read"] += 1
+            if isinstance(row, Exception):
+                errors = [{"msg": str(row)}]
+            else:
+                try:
+                    data = NewPaymentSchema(**{k: v for k, v in row.items() if k not in CONTACT_FIELDS})
+                    user_id = users.resolve(row)
+                except ValidationError as e:
+                    errors = e.errors(include_context=False)
+                else:
+                    errors = None if user_id is not None else [{"msg": "No user with this email or phone_number"}]
+
+            if errors:
+                stats["rejected"] += 1
+                if on_error:
+                    on_error(line_number, row, errors)
+                continue
+
+            chunk.append({
+                "user_id": user_id,
+                "payment_name": data.payment_name,
+                "description": data.description,
+                "amount": float(data.amount),
+                "category": data.category,
+                "deadline": data.deadline,
+                "status": data.status,
+            })
+            if len(chunk) >= chunk_size:
+                flush()
+                if uncommitted >= commit_every:
+                    commit()
+        commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return stats
@@ -0,0 +1,147 @@
+import base64
+import json
+import re
+import sqlalchemy as sa
+from datetime import datetime
+from decimal import Decimal
+from app import db
+from app.models import Payment
+
+# Created by the DDL in app/triggers.py, not mapped as models
+payment_fts = sa.table('payment_fts', sa.column('rowid'), sa.column('rank'))
+search_vector = sa.literal_column('payment.search_vector')
+
+
+def apply_payment_filters(query, filter_data, search=True):
+    if filter_data.status:
+        query = query.where(Payment.status == filter_data.status)
+    if filter_data.category:
+        query = query.where(Payment.category == filter_data.category)
+    if filter_data.search and search:
+        query = query.where(search_condition(filter_data.search))
+    return query
+
+
+def apply_selection(statement, selection, user_id):
+    # Bulk endpoints only ever touch the caller's own payments
+    statement = statement.where(Payment.user_id == user_id)
+    if selection.ids is not None:
+        return statement.where(Payment.id.in_(selection.ids))
+    return apply_payment_filters(statement, selection.filter)
+
+
+## FULL-TEXT SEARCH
+# Every word of the search term must match the start of a word in
+# payment_name or description ("elec bill" finds "Electricity bill").
+
+def search_condition(term):
+    words = re.findall(r"\w+", term)
+    dialect = db.engine.dialect.name
+
+    if words and dialect == 'sqlite':
+        match = sa.text("payment_fts MATCH :fts_query").bindparams(fts_query=_fts5_query(words))
+        return Payment.id.in_(sa.select(payment_fts.c.rowid).where(match))
+    if words and dialect == 'postgresql':
+        return search_vector.op('@@')(sa.func.to_tsquery('simple', _tsquery(words)))
+
+    search_term = f"%{term}%"
+    return sa.or_(
+        Payment.payment_name.ilike(search_term),
+        Payment.description.ilike(search_term)
+    )
+
+
+def apply_ranked_search(query, term):
+    """Filter by ``term`` and return the query with its best-match-first ordering."""
+    words = re.findall(r"\w+", term)
+    dialect = db.engine.dialect.name
+
+    if words and dialect == 'sqlite':
+        # FTS5's rank column is bm25(), lower is better
+        query = query.join(payment_fts, payment_fts.c.rowid == Payment.id).where(
+            sa.text("payment_fts MATCH :fts_query").bindparams(fts_query=_fts5_query(words)))
+        return query, [payment_fts.c.rank.asc(), Payment.id.asc()]
+    if words and dialect == 'postgresql':
+        tsquery = sa.func.to_tsquery('simple', _tsquery(words))
+        query = query.where(search_vector.op('@@')(tsquery))
+        return query, [sa.func.ts_rank(search_vector, tsquery).desc(), Payment.id.asc()]
+
+    query = query.where(search_condition(term))
+    return query, [Payment.payment_name.asc(), Payment.id.asc()]
+
+
+def _fts5_query(words):
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _tsquery(words):
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def sort_key(filter_data):
+    # Status and category have few distinct values, so rows within them are
+    # ordered by deadline (matching their composite indexes) and finally by id
+    # so the order is total, which keyset pagination relies on.
+    sort_column = getattr(Payment, filter_data.sort_by, Payment.deadline)
+    if filter_data.sort_by in ("status", "category"):
+        return [sort_column, Payment.deadline, Payment.id]
+    return [sort_column, Payment.id]
+
+
+def payment_list_query(filter_data, user_id=None, columns=None):
+    ranked = filter_data.sort_by == 'relevance'
+    query = sa.select(*(columns or (Payment,)))
+    query = apply_payment_filters(query, filter_data, search=not ranked)
+    if user_id is not None:
+        query = query.where(Payment.user_id == user_id)
+
+    if ranked:
+        query, order = apply_ranked_search(query, filter_data.search)
+        return query.order_by(*order)
+
+    if filter_data.sort_order == 'desc':
+        return query.order_by(*[column.desc() for column in sort_key(filter_data)])
+    return query.order_by(*[column.asc() for column in sort_key(filter_data)])
+
+
+## KEYSET (CURSOR) PAGINATION
+# A cursor holds the sort key of the last row on a page, tied to the sort it
+# was issued for. The next page seeks past it instead of using OFFSET.
+
+def encode_cursor(filter_data, payment):
+    values = []
+    for column in sort_key(filter_data):
+        value = getattr(payment, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        values.append(value)
+    raw = json.dumps([filter_data.sort_by, filter_data.sort_order, values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(filter_data):
+    try:
+        padded = filter_data.cursor + "=" * (-len(filter_data.cursor) % 4)
+        sort_by, sort_order, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if (sort_by, sort_order) != (filter_data.sort_by, filter_data.sort_order):
+        raise ValueError("Cursor does not match sort_by/sort_order")
+
+    columns = sort_key(filter_data)
+    if len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    return [
+        datetime.fromisoformat(value) if column.key == "deadline" else value
+        for column, value in zip(columns, values)
+    ]
+
+
+def apply_cursor(query, filter_data, position):
+    key = sa.tuple_(*sort_key(filter_data))
+    if filter_data.sort_order == 'desc':
+        return query.where(key < sa.tuple_(*position))
+    return query.where(key > sa.tuple_(*position))
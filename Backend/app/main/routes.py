@@ -1,14 +1,23 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 import sqlalchemy as sa
 from pydantic import ValidationError
-from app import db
+from app import db, listing_cache
 from app.main import bp
 from app.models import Payment
 from flask_login import login_required, current_user
-from app.main.schema import NewPaymentSchema, EditStatusSchema , PaymentFilterSchema
+from app.main.schema import NewPaymentSchema, EditStatusSchema , PaymentFilterSchema, BulkStatusSchema, PaymentSelectionSchema
+from app.main.queries import payment_list_query, encode_cursor, decode_cursor, apply_cursor, apply_selection
+from app.main.summary import summary_total, summary_breakdown
+from app.main.serializers import PAYMENT_COLUMNS, payment_to_dict, json_response
+from app.main.versions import listing_etag
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import make_response
 
+def current_owner_id():
+    # Listings are scoped to the signed-in user, anonymous requests see everything
+    return current_user.id if current_user.is_authenticated else None
+
+
 @bp.route('/payments', methods=["POST"])
 @login_required
 def payment():
@@ -25,7 +34,7 @@ def payment():
     except ValidationError as e:
         return jsonify({
             "status": "fail", 
-            "errors": e.errors()
+            "errors": e.errors(include_context=False)
         }), 400
     except Exception as e:
         return jsonify({
@@ -46,30 +55,96 @@ def payment():
         
         db.session.add(payment)
         db.session.commit()
+        listing_cache.invalidate(current_user.id)
         
-        return jsonify({
+        return json_response({
             "status": "success",
             "message": "Payment created successfully",
-            "payment": {
-                "id": payment.id,
-                "payment_name": payment.payment_name,
-                "description": payment.description,  
-                "amount": float(payment.amount),
-                "category": payment.category,
-                "deadline": payment.deadline.isoformat(),
-                "status": payment.status,
-                "user_id": payment.user_id
-            }
-        }), 201
+            "payment": {**payment_to_dict(payment), "user_id": payment.user_id}
+        }, 201)
         
     except Exception as e:
         db.session.rollback()
-        print(f"Database error: {str(e)}")  
+        current_app.logger.exception("Database error adding payment")
         return jsonify({
             "status": "fail",
             "message": f"Failed to create payment: {str(e)}"  
         }), 500
 
+
+@bp.route('/payments/bulk', methods=["POST"])
+@login_required
+def bulk_create_payments():
+    json_data = request.get_json(silent=True)
+    items = json_data.get("payments") if isinstance(json_data, dict) else json_data
+
+    if not isinstance(items, list) or not items:
+        return jsonify({
+            "status": "fail",
+            "message": "Provide a non-empty list of payments"
+        }), 400
+
+    max_items = current_app.config["PAYMENT_BULK_MAX_ITEMS"]
+    if len(items) > max_items:
+        return jsonify({
+            "status": "fail",
+            "message": f"At most {max_items} payments can be imported per request"
+        }), 413
+
+    rows, row_indexes, errors = [], [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise TypeError("Each payment must be a JSON object")
+            data = NewPaymentSchema(**item)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_context=False)})
+            continue
+        except TypeError as e:
+            errors.append({"index": index, "message": str(e)})
+            continue
+
+        rows.append({
+            "user_id": current_user.id,
+            "payment_name": data.payment_name,
+            "description": data.description,
+            "amount": float(data.amount),
+            "category": data.category,
+            "deadline": data.deadline,
+            "status": data.status
+        })
+        row_indexes.append(index)
+
+    if not rows:
+        return jsonify({
+            "status": "fail",
+            "message": "No valid payments to import",
+            "errors": errors
+        }), 400
+
+    try:
+        # One multi-row INSERT in one transaction for the whole batch
+        ids = db.session.scalars(
+            sa.insert(Payment).returning(Payment.id, sort_by_parameter_order=True),
+            rows
+        ).all()
+        db.session.commit()
+        listing_cache.invalidate(current_user.id)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error during bulk import")
+        return jsonify({
+            "status": "fail",
+            "message": f"Failed to import payments: {str(e)}"
+        }), 500
+
+    return json_response({
+        "status": "success",
+        "message": f"Imported {len(ids)} of {len(items)} payments",
+        "created": [{"index": index, "id": payment_id} for index, payment_id in zip(row_indexes, ids)],
+        "errors": errors
+    }, 201)
+
     
 @bp.route("/payments", methods=["GET"])
 # @jwt_required()  # JWT is commented out for now
@@ -82,12 +157,15 @@ def get_payments():
             sort_by=request.args.get('sort_by', 'deadline'),
             sort_order=request.args.get('sort_order', 'asc'),
             page=int(request.args.get("page", 1)),
-            per_page=min(int(request.args.get("per_page", 10)), 100)
+            per_page=min(int(request.args.get("per_page", 10)), 100),
+            cursor=request.args.get('cursor')
         )
+        # An empty cursor= asks for the first page in cursor mode
+        position = decode_cursor(filter_data) if filter_data.cursor else None
     except ValidationError as e:
         return jsonify({
             "status": "fail",
-            "errors": e.errors()
+            "errors": e.errors(include_context=False)
         }), 400
     except (ValueError, TypeError):
         return jsonify({
@@ -96,65 +174,65 @@ def get_payments():
         }), 400
 
     # user_id = get_jwt_identity()  # JWT removed, no filtering by user now
+    owner_id = current_owner_id()
 
     try:
-        orm_query = db.session.query(Payment)  # No user filtering
-
-        # Apply filters if provided
-        if filter_data.status:
-            orm_query = orm_query.filter(Payment.status == filter_data.status)
-        if filter_data.category:
-            orm_query = orm_query.filter(Payment.category == filter_data.category)
-        if filter_data.search:
-            search_term = f"%{filter_data.search}%"
-            orm_query = orm_query.filter(
-                sa.or_(
-                    Payment.payment_name.ilike(search_term),
-                    Payment.description.ilike(search_term)
-                )
-            )
+        # Answer revalidations from the data version alone, before touching payments
+        etag = listing_etag(owner_id, filter_data)
+        if request.if_none_match.contains_weak(etag):
+            return listing_response(current_app.response_class(status=304), etag)
 
-        # Sorting
-        sort_column = getattr(Payment, filter_data.sort_by, Payment.deadline)
-        if filter_data.sort_order == 'desc':
-            orm_query = orm_query.order_by(sort_column.desc())
+        # The etag already names this user, query and data version
+        cache_key = "payments:" + etag
+        body = listing_cache.get(cache_key)
+        if body is not None:
+            response = current_app.response_class(body, mimetype="application/json")
+            response.headers["X-Cache"] = "HIT"
+            return listing_response(response, etag)
+
+        query = payment_list_query(filter_data, user_id=owner_id, columns=PAYMENT_COLUMNS)
+
+        if filter_data.cursor is not None:
+            # Cursor mode: seek past the last row and skip the COUNT(*)
+            if position is not None:
+                query = apply_cursor(query, filter_data, position)
+            items = db.session.execute(query.limit(filter_data.per_page + 1)).all()
+            has_next = len(items) > filter_data.per_page
+            items = items[:filter_data.per_page]
+            pagination_data = {
+                "per_page": filter_data.per_page,
+                "has_next": has_next,
+                "next_cursor": encode_cursor(filter_data, items[-1]) if has_next else None
+            }
         else:
-            orm_query = orm_query.order_by(sort_column.asc())
-
-        # Pagination
-        pagination = db.paginate(
-            orm_query,
-            page=filter_data.page,
-            per_page=filter_data.per_page,
-            error_out=False
-        )
+            # Pagination
+            page, per_page = filter_data.page, filter_data.per_page
+            items = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+            if filter_data.search:
+                total = db.session.scalar(
+                    sa.select(sa.func.count()).select_from(query.order_by(None).subquery())
+                )
+            else:
+                # Status/category totals are kept in payment_summary, skip the COUNT(*)
+                total = summary_total(owner_id, filter_data.status, filter_data.category)
+            total_pages = -(-total // per_page)
+            pagination_data = {
+                "page": page,
+                "per_page": per_page,
+                "total_count": total,
+                "total_pages": total_pages,
+                "has_next": page < total_pages,
+                "has_prev": page > 1,
+                "next_page": page + 1 if page < total_pages else None,
+                "prev_page": page - 1 if page > 1 else None
+            }
 
         # Response JSON
-        return jsonify({
+        response = json_response({
             "status": "success",
             "data": {
-                "payments": [
-                    {
-                        "id": payment.id,
-                        "payment_name": payment.payment_name,
-                        "description": payment.description,
-                        "amount": float(payment.amount),
-                        "category": payment.category,
-                        "deadline": payment.deadline.isoformat(),
-                        "status": payment.status
-                    }
-                    for payment in pagination.items
-                ],
-                "pagination": {
-                    "page": pagination.page,
-                    "per_page": pagination.per_page,
-                    "total_count": pagination.total,
-                    "total_pages": pagination.pages,
-                    "has_next": pagination.has_next,
-                    "has_prev": pagination.has_prev,
-                    "next_page": pagination.next_num if pagination.has_next else None,
-                    "prev_page": pagination.prev_num if pagination.has_prev else None
-                },
+                "payments": [payment_to_dict(payment) for payment in items],
+                "pagination": pagination_data,
                 "filters": {
                     "status": filter_data.status,
                     "category": filter_data.category,
@@ -163,10 +241,13 @@ def get_payments():
                     "sort_order": filter_data.sort_order
                 }
             }
-        }), 200
+        })
+        listing_cache.set(cache_key, response.get_data(as_text=True), scope=owner_id)
+        response.headers["X-Cache"] = "MISS"
+        return listing_response(response, etag)
 
-    except Exception as e:
-        print("Database error:", str(e))
+    except Exception:
+        current_app.logger.exception("Database error listing payments")
         return jsonify({
             "status": "fail",
             "message": "Failed to fetch payments"
@@ -174,6 +255,132 @@ def get_payments():
 
     
 
+def listing_response(response, etag):
+    # Browsers revalidate on every load and get a 304 while nothing changed
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@bp.route("/payments/summary", methods=["GET"])
+def get_payment_summary():
+    try:
+        return json_response({
+            "status": "success",
+            "data": summary_breakdown(current_owner_id())
+        })
+    except Exception:
+        current_app.logger.exception("Database error summarizing payments")
+        return jsonify({
+            "status": "fail",
+            "message": "Failed to fetch payment summary"
+        }), 500
+
+
+@bp.route('/payments/status', methods=['PATCH'])
+@login_required
+def bulk_change_status():
+    try:
+        json_data = request.get_json()
+        if not json_data:
+            return jsonify({
+                "status": "fail",
+                "message": "No JSON data provided"
+            }), 400
+
+        data = BulkStatusSchema(**json_data)
+
+    except ValidationError as e:
+        return jsonify({
+            "status": "fail",
+            "errors": e.errors(include_context=False)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "status": "fail",
+            "message": "Invalid JSON"
+        }), 400
+
+    try:
+        # One set-based UPDATE; rows already in the target status are left alone
+        statement = apply_selection(sa.update(Payment), data, current_user.id)
+        statement = (
+            statement.where(Payment.status != data.status)
+            .values(status=data.status)
+            .returning(Payment.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated_ids = db.session.scalars(statement).all()
+        db.session.commit()
+        if updated_ids:
+            listing_cache.invalidate(current_user.id)
+
+        return json_response({
+            "status": "success",
+            "message": f"Updated {len(updated_ids)} payments to '{data.status}'",
+            "updated_ids": updated_ids
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error in bulk status update")
+        return jsonify({
+            "status": "fail",
+            "message": f"Failed to update payment status: {str(e)}"
+        }), 500
+
+
+@bp.route('/payments', methods=['DELETE'])
+@login_required
+def bulk_delete_payments():
+    try:
+        json_data = request.get_json()
+        if not json_data:
+            return jsonify({
+                "status": "fail",
+                "message": "No JSON data provided"
+            }), 400
+
+        data = PaymentSelectionSchema(**json_data)
+
+    except ValidationError as e:
+        return jsonify({
+            "status": "fail",
+            "errors": e.errors(include_context=False)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "status": "fail",
+            "message": "Invalid JSON"
+        }), 400
+
+    try:
+        statement = (
+            apply_selection(sa.delete(Payment), data, current_user.id)
+            .returning(Payment.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted_ids = db.session.scalars(statement).all()
+        db.session.commit()
+        if deleted_ids:
+            listing_cache.invalidate(current_user.id)
+
+        return json_response({
+            "status": "success",
+            "message": f"Deleted {len(deleted_ids)} payments",
+            "deleted_ids": deleted_ids
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error in bulk delete")
+        return jsonify({
+            "status": "fail",
+            "message": f"Failed to delete payments: {str(e)}"
+        }), 500
+
+
 @bp.route('/payment/<int:payment_id>/status', methods=['PATCH'])
 # @jwt_required()
 def change_status(payment_id):
@@ -192,7 +399,7 @@ def change_status(payment_id):
     except ValidationError as e:
         return jsonify({
             "status": "fail", 
-            "errors": e.errors()
+            "errors": e.errors(include_context=False)
         }), 400
     except Exception as e:
         return jsonify({
@@ -201,57 +408,46 @@ def change_status(payment_id):
         }), 400
 
     try:
-
-        payment = db.session.query(Payment).filter_by(id=payment_id).first()
+        # Single UPDATE ... RETURNING; the "already in this status" case is
+        # filtered out by the WHERE clause instead of a prior SELECT
+        payment = db.session.execute(
+            sa.update(Payment)
+            .where(Payment.id == payment_id, Payment.status != data.status)
+            .values(status=data.status)
+            .returning(*PAYMENT_COLUMNS, Payment.user_id)
+            .execution_options(synchronize_session=False)
+        ).first()
 
         if not payment:
-            return jsonify({
-                "status": "fail",
-                "message": "Payment not found"  
-            }), 404
+            # Nothing updated: only now find out whether the row exists at all
+            payment = db.session.execute(
+                sa.select(*PAYMENT_COLUMNS).where(Payment.id == payment_id)
+            ).first()
 
-     
-        old_status = payment.status
-        
-      
-        if old_status == data.status:
-            return jsonify({
+            if not payment:
+                return jsonify({
+                    "status": "fail",
+                    "message": "Payment not found"  
+                }), 404
+
+            return json_response({
                 "status": "success",
                 "message": f"Payment status is already '{data.status}'",
-                "data": {
-                    "id": payment.id,
-                    "payment_name": payment.payment_name,
-                    "description": payment.description,
-                    "amount": float(payment.amount),
-                    "category": payment.category,
-                    "deadline": payment.deadline.isoformat(),
-                    "status": payment.status
-                }
-            }), 200
-        
-       
-        payment.status = data.status 
-        
+                "data": payment_to_dict(payment)
+            })
+
         db.session.commit()
+        listing_cache.invalidate(payment.user_id)
 
-        return jsonify({
+        return json_response({
             "status": "success",
             "message": "Payment status updated successfully",
-            "data": {
-                "id": payment.id,
-                "payment_name": payment.payment_name,
-                "description": payment.description,
-                "amount": float(payment.amount),
-                "category": payment.category,
-                "deadline": payment.deadline.isoformat(),
-                "status": payment.status,
-                "previous_status": old_status  
-            }
-        }), 200
+            "data": payment_to_dict(payment)
+        })
         
     except Exception as e:
         db.session.rollback()  
-        print(f"Database error updating payment {payment_id}: {str(e)}")
+        current_app.logger.exception("Database error updating payment %s", payment_id)
         return jsonify({
             "status": "fail",
             "message": f"Failed to update payment status: {str(e)}"
@@ -263,25 +459,28 @@ def change_status(payment_id):
 def delete_payment(payment_id):
     try:
       
-        payment = db.session.query(Payment).filter_by(id=payment_id).first()
+        deleted = db.session.execute(
+            sa.delete(Payment)
+            .where(Payment.id == payment_id)
+            .returning(Payment.payment_name, Payment.amount, Payment.user_id)
+            .execution_options(synchronize_session=False)
+        ).first()
 
-        if not payment:
+        if not deleted:
             return jsonify({
                 "status": "fail",
                 "message": "Payment not found" 
             }), 404
 
-       
-        payment_name = payment.payment_name
-        payment_amount = float(payment.amount)
-        
-      
-        db.session.delete(payment)
         db.session.commit()
+        listing_cache.invalidate(deleted.user_id)
+
+        payment_name = deleted.payment_name
+        payment_amount = float(deleted.amount)
         
-        print(f"Payment {payment_id} ('{payment_name}') deleted successfully")  
+        current_app.logger.info("Payment %s (%r) deleted", payment_id, payment_name)
 
-        return jsonify({
+        return json_response({
             "status": "success",
             "message": f"Payment '{payment_name}' deleted successfully",
             "deleted_payment": {
@@ -289,11 +488,11 @@ def delete_payment(payment_id):
                 "payment_name": payment_name,
                 "amount": payment_amount
             }
-        }), 200
+        })
 
     except Exception as e:
         db.session.rollback() 
-        print(f"Database error deleting payment {payment_id}: {str(e)}") 
+        current_app.logger.exception("Database error deleting payment %s", payment_id)
         return jsonify({
             "status": "fail",
             "message": f"Failed to delete payment: {str(e)}"  
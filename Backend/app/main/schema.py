@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic_core import PydanticCustomError
 from typing import Annotated, Optional, Literal
 from datetime import datetime
 
@@ -58,8 +59,8 @@ class PaymentFilterSchema(BaseModel):
         Field(None, min_length=1, max_length=100, description="Search in payment name and description")
     ]
     sort_by: Annotated[
-        Optional[Literal["deadline", "amount", "payment_name", "status", "category"]], 
-        Field("deadline", description="Field to sort by")
+        Optional[Literal["deadline", "amount", "payment_name", "status", "category", "relevance"]], 
+        Field("deadline", description="Field to sort by, 'relevance' ranks search matches")
     ]
     sort_order: Annotated[
         Optional[Literal["asc", "desc"]], 
@@ -73,9 +74,48 @@ class PaymentFilterSchema(BaseModel):
         Optional[int], 
         Field(10, ge=1, le=100, description="Items per page")
     ]
+    cursor: Annotated[
+        Optional[str],
+        Field(None, max_length=500, description="Cursor from a previous page, switches to keyset pagination")
+    ]
 
     @field_validator('search')
     def validate_search(cls, v):
         if v is not None and v.strip() == '':
             return None
-        return v.strip() if v else None
\ No newline at end of file
+        return v.strip() if v else None
+
+    @model_validator(mode='after')
+    def validate_relevance(self):
+        if self.sort_by == 'relevance':
+            if not self.search:
+                raise PydanticCustomError('relevance_without_search', "sort_by 'relevance' requires a search term")
+            if self.cursor is not None:
+                raise PydanticCustomError('relevance_with_cursor', "sort_by 'relevance' is not supported with cursor pagination")
+        return self
+
+
+class PaymentSelectionSchema(BaseModel):
+    ids: Annotated[
+        Optional[list[int]],
+        Field(None, min_length=1, max_length=1000, description="Payment ids to act on")
+    ]
+    filter: Annotated[
+        Optional[PaymentFilterSchema],
+        Field(None, description="Act on every payment matching status/category/search")
+    ]
+
+    @model_validator(mode='after')
+    def validate_selection(self):
+        if (self.ids is None) == (self.filter is None):
+            raise PydanticCustomError('selection_required', "Provide exactly one of 'ids' or 'filter'")
+        if self.filter is not None and not (self.filter.status or self.filter.category or self.filter.search):
+            raise PydanticCustomError('empty_filter', "Filter needs at least one of status, category or search")
+        return self
+
+
+class BulkStatusSchema(PaymentSelectionSchema):
+    status: Annotated[
+        Literal["pending", "paid", "overdue", "cancelled"],
+        Field(..., description="New status for the selected payments")
+    ]
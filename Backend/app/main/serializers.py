@@ -0,0 +1,44 @@
+import json
+from flask import current_app
+from app.models import Payment
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Everything a payment response needs; select these instead of whole ORM
+# objects so listings skip identity-map bookkeeping.
+PAYMENT_COLUMNS = (
+    Payment.id,
+    Payment.payment_name,
+    Payment.description,
+    Payment.amount,
+    Payment.category,
+    Payment.deadline,
+    Payment.status,
+)
+
+
+def payment_to_dict(payment):
+    """Serialize a Payment instance or a row selected with PAYMENT_COLUMNS."""
+    return {
+        "id": payment.id,
+        "payment_name": payment.payment_name,
+        "description": payment.description,
+        "amount": float(payment.amount),
+        "category": payment.category,
+        "deadline": payment.deadline.isoformat(),
+        "status": payment.status
+    }
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype="application/json")
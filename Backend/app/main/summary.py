@@ -0,0 +1,86 @@
+import sqlalchemy as sa
+from app import db
+from app.models import Payment, PaymentSummary, PaymentTotal
+from app.triggers import SUMMARY_STRIPES
+
+
+def _counters(user_id):
+    # All users read the striped totals: a fixed number of rows, however
+    # many users there are
+    if user_id is None:
+        return PaymentTotal, []
+    return PaymentSummary, [PaymentSummary.user_id == user_id]
+
+
+def summary_total(user_id=None, status=None, category=None):
+    table, where = _counters(user_id)
+    query = sa.select(sa.func.coalesce(sa.func.sum(table.payment_count), 0)).where(*where)
+    if status:
+        query = query.where(table.status == status)
+    if category:
+        query = query.where(table.category == category)
+    return db.session.scalar(query)
+
+
+def summary_breakdown(user_id=None):
+    table, where = _counters(user_id)
+    query = sa.select(
+        table.status,
+        table.category,
+        sa.func.sum(table.payment_count),
+        sa.func.sum(table.amount_total),
+    ).where(*where).group_by(table.status, table.category)
+
+    by_status, by_category = {}, {}
+    total = {"count": 0, "amount": 0.0}
+    for status, category, count, amount in db.session.execute(query):
+        if not count:
+            continue
+        for bucket in (by_status.setdefault(status, {"count": 0, "amount": 0.0}),
+                       by_category.setdefault(category, {"count": 0, "amount": 0.0}),
+                       total):
+            bucket["count"] += count
+            bucket["amount"] = round(bucket["amount"] + float(amount), 2)
+    return {"total": total, "by_status": by_status, "by_category": by_category}
+
+
+def rebuild_summary(user_id=None):
+    """Recompute summary rows from the payment table to repair any drift.
+
+    The striped all users totals are rebuilt from the result, only for the
+    user's stripe when ``user_id`` is given.
+    """
+    delete = sa.delete(PaymentSummary)
+    source = sa.select(
+        Payment.user_id,
+        sa.cast(Payment.status, sa.String(20)),
+        sa.cast(Payment.category, sa.String(20)),
+        sa.func.count(),
+        sa.func.sum(Payment.amount),
+    ).group_by(Payment.user_id, Payment.status, Payment.category)
+    if user_id is not None:
+        delete = delete.where(PaymentSummary.user_id == user_id)
+        source = source.where(Payment.user_id == user_id)
+
+    db.session.execute(delete)
+    result = db.session.execute(sa.insert(PaymentSummary).from_select(
+        ["user_id", "status", "category", "payment_count", "amount_total"], source))
+
+    stripe = PaymentSummary.user_id % SUMMARY_STRIPES
+    delete = sa.delete(PaymentTotal)
+    source = sa.select(
+        stripe,
+        PaymentSummary.status,
+        PaymentSummary.category,
+        sa.func.sum(PaymentSummary.payment_count),
+        sa.func.sum(PaymentSummary.amount_total),
+    ).group_by(stripe, PaymentSummary.status, PaymentSummary.category)
+    if user_id is not None:
+        delete = delete.where(PaymentTotal.stripe == user_id % SUMMARY_STRIPES)
+        source = source.where(stripe == user_id % SUMMARY_STRIPES)
+
+    db.session.execute(delete)
+    db.session.execute(sa.insert(PaymentTotal).from_select(
+        ["stripe", "status", "category", "payment_count", "amount_total"], source))
+    db.session.commit()
+    return result.rowcount
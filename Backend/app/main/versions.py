@@ -0,0 +1,22 @@
+import hashlib
+import sqlalchemy as sa
+from app import db
+from app.models import PaymentVersion
+
+
+def data_version(user_id=None):
+    if user_id is None:
+        # All users: the sum of the stripe rows (negative scope ids)
+        return db.session.scalar(
+            sa.select(sa.func.sum(PaymentVersion.version)).where(PaymentVersion.scope_id < 0)
+        ) or 0
+    return db.session.scalar(
+        sa.select(PaymentVersion.version).where(PaymentVersion.scope_id == user_id)
+    ) or 0
+
+
+def listing_etag(user_id, filter_data):
+    # Same data version + same normalized query => same response body
+    query_key = f"{user_id}:{filter_data.model_dump_json()}".encode()
+    digest = hashlib.blake2b(query_key, digest_size=8).hexdigest()
+    return f"{data_version(user_id)}-{digest}"
@@ -0,0 +1,231 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROVIDER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+## METRIC TYPES
+# Just enough of the Prometheus data model for one process: labelled
+# counters and histograms, rendered in the text exposition format.
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+## EXTENSION
+
+
+class Metrics:
+    """Request, SQL and provider metrics served at /metrics, enabled by METRICS_ENABLED.
+
+    Values live in this process only, so with several workers each scrape
+    sees the worker that answered it; scrape workers individually or run one
+    worker per port. When disabled nothing is hooked in and
+    provider_timer() is a no-op.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.request_seconds = Histogram(
+            "duemate_request_duration_seconds", "Time spent handling a request.",
+            ("method", "endpoint"))
+        self.responses = Counter(
+            "duemate_responses_total", "Responses sent, by status code.",
+            ("method", "endpoint", "status"))
+        self.request_queries = Histogram(
+            "duemate_request_queries", "SQL statements executed per request.",
+            ("endpoint",), QUERY_COUNT_BUCKETS)
+        self.request_db_seconds = Histogram(
+            "duemate_request_db_seconds", "Time spent in SQL per request.", ("endpoint",))
+        self.queries = Counter("duemate_db_queries_total", "SQL statements executed.")
+        self.db_seconds = Counter("duemate_db_seconds_total", "Time spent executing SQL.")
+        self.provider_seconds = Histogram(
+            "duemate_provider_request_seconds", "Outbound email and SMS provider calls.",
+            ("provider", "outcome"), PROVIDER_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["metrics"] = self
+        self.enabled = app.config["METRICS_ENABLED"]
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule(app.config["METRICS_PATH"], "metrics", self.export)
+
+        with app.app_context():
+            engine = app.extensions["sqlalchemy"].engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    ## REQUESTS
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_seconds = 0.0
+
+    def _end_request(self, response):
+        self._record_request(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when an exception propagates out of the
+        # view (debug, testing or a failing error handler); count it as a 500
+        self._record_request(500)
+
+    def _record_request(self, status_code):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        # The endpoint name, not the URL, keeps label cardinality bounded
+        endpoint = request.endpoint or "unmatched"
+        self.request_seconds.observe(time.perf_counter() - started, request.method, endpoint)
+        self.responses.inc(request.method, endpoint, str(status_code))
+        self.request_queries.observe(g.metrics_queries, endpoint)
+        self.request_db_seconds.observe(g.metrics_db_seconds, endpoint)
+
+    ## SQL
+
+    # The start time rides on the execution context, which is dropped with
+    # the statement whether it succeeds or raises
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._record_query(context)
+
+    def _handle_error(self, exception_context):
+        self._record_query(exception_context.execution_context)
+
+    def _record_query(self, context):
+        started = getattr(context, "metrics_started", None)
+        if started is None:
+            return
+        del context.metrics_started
+        elapsed = time.perf_counter() - started
+        self.queries.inc()
+        self.db_seconds.inc(amount=elapsed)
+        if has_request_context() and "metrics_started" in g:
+            g.metrics_queries += 1
+            g.metrics_db_seconds += elapsed
+
+    ## PROVIDERS
+
+    @contextmanager
+    def provider_timer(self, provider):
+        """Time one outbound provider call; outcome is "error" if it raises."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "success"
+        finally:
+            self.provider_seconds.observe(time.perf_counter() - started, provider, outcome)
+
+    ## EXPORT
+
+    def _cache_lines(self):
+        cache = current_app.extensions.get("listing_cache")
+        if cache is None or cache.backend is None:
+            return
+        for key, value in cache.stats().items():
+            name = f"duemate_listing_cache_{key}_total"
+            yield f"# HELP {name} Listing cache {key} in this process."
+            yield f"# TYPE {name} counter"
+            yield f"{name} {value}"
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.responses, self.request_queries,
+                       self.request_db_seconds, self.queries, self.db_seconds,
+                       self.provider_seconds):
+            lines.extend(metric.render())
+        lines.extend(self._cache_lines())
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
@@ -1,7 +1,7 @@
 import sqlalchemy as sa
 import sqlalchemy.orm as so
 from datetime import datetime
-from app import db
+from app import db, triggers
 from flask_login import UserMixin
 
 class User(UserMixin, db.Model):
@@ -9,6 +9,8 @@ class User(UserMixin, db.Model):
 
     email: so.Mapped[str] = so.mapped_column(sa.String(200), index=True, unique=True, nullable=True)
     phone_number: so.Mapped[str] = so.mapped_column(sa.String(15), unique=True, nullable=True)
+    # One combined reminder per run instead of one per payment; None follows the run's default
+    reminder_digest: so.Mapped[bool] = so.mapped_column(sa.Boolean, nullable=True)
     payments: so.WriteOnlyMapped['Payment'] = so.relationship(back_populates='user')
 
     def __repr__(self):
@@ -34,5 +36,165 @@ class Payment(db.Model):
     
     user: so.Mapped[User] = so.relationship(back_populates='payments')
 
+    # Cover the /api/payments filter/sort combinations and the due-date scan
+    __table_args__ = (
+        sa.Index('ix_payment_deadline_status', 'deadline', 'status'),
+        sa.Index('ix_payment_status_deadline', 'status', 'deadline'),
+        sa.Index('ix_payment_category_deadline', 'category', 'deadline'),
+        sa.Index('ix_payment_user_id_deadline', 'user_id', 'deadline'),
+        sa.Index('ix_payment_user_id_status_deadline', 'user_id', 'status', 'deadline'),
+        sa.Index('ix_payment_amount', 'amount'),
+        sa.Index('ix_payment_payment_name', 'payment_name'),
+        # Anonymous listings filtered by status or category, in each sort
+        sa.Index('ix_payment_status_amount', 'status', 'amount'),
+        sa.Index('ix_payment_status_payment_name', 'status', 'payment_name'),
+        sa.Index('ix_payment_status_category_deadline', 'status', 'category', 'deadline'),
+        sa.Index('ix_payment_category_amount', 'category', 'amount'),
+        sa.Index('ix_payment_category_payment_name', 'category', 'payment_name'),
+        sa.Index('ix_payment_category_status_deadline', 'category', 'status', 'deadline'),
+    )
+
+    def __repr__(self):
+        return f'<Payment {self.payment_name}: {self.amount}>'
+
+
+class PaymentSummary(db.Model):
+    __tablename__ = 'payment_summary'
+
+    # Maintained by the triggers in app/triggers.py, one row per (user, status, category)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), primary_key=True)
+    status: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+    category: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+
+    payment_count: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    amount_total: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PaymentSummary {self.user_id} {self.status}/{self.category}: {self.payment_count}>'
+
+
+class PaymentTotal(db.Model):
+    __tablename__ = 'payment_total'
+
+    # payment_summary summed over every user, kept per stripe of users by the
+    # triggers in app/triggers.py so concurrent writers rarely share a row
+    stripe: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True, autoincrement=False)
+    status: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+    category: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+
+    payment_count: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    amount_total: so.Mapped[float] = so.mapped_column(sa.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PaymentTotal {self.stripe} {self.status}/{self.category}: {self.payment_count}>'
+
+
+class PaymentVersion(db.Model):
+    __tablename__ = 'payment_version'
+
+    # Bumped by the triggers in app/triggers.py; negative scopes are the
+    # stripes that together version every user's payments
+    scope_id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True, autoincrement=False)
+    version: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PaymentVersion {self.scope_id}: {self.version}>'
+
+
+class FeatureFlag(db.Model):
+    __tablename__ = 'feature_flag'
+
+    # Switches the database triggers read, since they cannot see app config
+    name: so.Mapped[str] = so.mapped_column(sa.String(50), primary_key=True)
+    enabled: so.Mapped[bool] = so.mapped_column(sa.Boolean, nullable=False, default=False)
+
     def __repr__(self):
-        return f'<Payment {self.payment_name}: {self.amount}>'
\ No newline at end of file
+        return f'<FeatureFlag {self.name}: {self.enabled}>'
+
+
+class PaymentChange(db.Model):
+    __tablename__ = 'payment_change'
+
+    # Appended by the triggers in app/triggers.py while the change_feed flag
+    # is on, consumed by the reminder scheduler
+    id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True)
+    payment_id: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False)
+
+    # Ids are never reused, even once the feed has been consumed
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def __repr__(self):
+        return f'<PaymentChange {self.id}: payment {self.payment_id}>'
+
+
+class ReminderLog(db.Model):
+    __tablename__ = 'reminder_log'
+
+    # One row per reminder actually sent, so no (payment, window, channel) goes out twice
+    payment_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey('payment.id', ondelete='CASCADE'), primary_key=True)
+    window: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+    channel: so.Mapped[str] = so.mapped_column(sa.String(10), primary_key=True)
+    sent_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ReminderLog {self.payment_id} {self.window}/{self.channel}>'
+
+
+class ReminderWatermark(db.Model):
+    __tablename__ = 'reminder_watermark'
+
+    # How far the reminder cron has scanned each window, see app/cron/reminders.py
+    window: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+    scanned_until: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False)
+    last_payment_id: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ReminderWatermark {self.window}: {self.scanned_until}>'
+
+
+class ReminderRetry(db.Model):
+    __tablename__ = 'reminder_retry'
+
+    # Payments whose reminder failed to send; every cron run rescans them
+    # until all their channels are in reminder_log
+    payment_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey('payment.id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f'<ReminderRetry {self.payment_id}>'
+
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox'
+
+    # Written in the same transaction as whatever caused the message, sent by flask outbox drain
+    id: so.Mapped[int] = so.mapped_column(sa.Integer, primary_key=True)
+    channel: so.Mapped[str] = so.mapped_column(sa.String(10), nullable=False)
+    recipient: so.Mapped[str] = so.mapped_column(sa.String(200), nullable=False)
+    subject: so.Mapped[str] = so.mapped_column(sa.String(200), nullable=True)
+    html: so.Mapped[str] = so.mapped_column(sa.Text, nullable=True)
+    text: so.Mapped[str] = so.mapped_column(sa.Text, nullable=False)
+    # OTP request id whose delivery status follows this message, if any
+    status_key: so.Mapped[str] = so.mapped_column(sa.String(200), nullable=True)
+
+    status: so.Mapped[str] = so.mapped_column(sa.String(10), nullable=False, default='pending')
+    attempts: so.Mapped[int] = so.mapped_column(sa.Integer, nullable=False, default=0)
+    # Next attempt for pending rows; while claimed, the end of the claim's lease
+    available_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False)
+    claim_token: so.Mapped[str] = so.mapped_column(sa.String(32), nullable=True)
+    last_error: so.Mapped[str] = so.mapped_column(sa.Text, nullable=True)
+    created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False)
+    # Set for OTPs: not sent after this, and the payload is scrubbed once the
+    # row expires or fails
+    expires_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=True)
+
+    __table_args__ = (
+        sa.Index('ix_outbox_status_available_at', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.channel} to {self.recipient}: {self.status}>'
+
+
+triggers.register(db.metadata)
@@ -0,0 +1,234 @@
+import logging
+import random
+import time
+import uuid
+import sqlalchemy as sa
+from collections import Counter
+from datetime import datetime, timedelta
+from app import db, otp_store
+from app.models import OutboxMessage
+from app.utils import sms_delivered
+
+logger = logging.getLogger(__name__)
+
+
+## WRITING
+# Rows are only added to the session; they commit (or roll back) together
+# with the change that produced them.
+
+
+def enqueue_email(message, status_key=None, expires_at=None):
+    now = datetime.now()
+    db.session.add(OutboxMessage(
+        channel="email", recipient=message["to"], subject=message["subject"],
+        html=message["html"], text=message.get("text", ""), status_key=status_key,
+        status="pending", attempts=0, available_at=now, created_at=now, expires_at=expires_at,
+    ))
+
+
+def enqueue_sms(to_number, message_text, status_key=None, expires_at=None):
+    now = datetime.now()
+    db.session.add(OutboxMessage(
+        channel="sms", recipient=to_number, text=message_text, status_key=status_key,
+        status="pending", attempts=0, available_at=now, created_at=now, expires_at=expires_at,
+    ))
+
+
+class OutboxWriter:
+    """Stands in for DeliveryEngine when OUTBOX_ENABLED is set.
+
+    Same send_emails/send_sms_batch interface, but each message becomes an
+    outbox row in the caller's transaction and comes back as "queued".
+    """
+
+    def __init__(self):
+        self.stats = {"email": Counter(), "sms": Counter()}
+        self._started = time.monotonic()
+
+    def send_emails(self, messages):
+        for message in messages:
+            enqueue_email(message)
+        self.stats["email"]["queued"] += len(messages)
+        return [{"status": "queued", "to": message["to"]} for message in messages]
+
+    def send_sms_batch(self, messages):
+        for to_number, message_text in messages:
+            enqueue_sms(to_number, message_text)
+        self.stats["sms"]["queued"] += len(messages)
+        return [{"status": "queued", "to": [to_number]} for to_number, _ in messages]
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        summary = {channel: dict(counts) for channel, counts in self.stats.items()}
+        summary["seconds"] = elapsed
+        summary["messages_per_second"] = 0.0
+        return summary
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+## DRAINING
+
+# What is left of a row with an expiry once it is dead: no OTP at rest
+SCRUBBED = {"subject": None, "html": None, "text": ""}
+
+
+def expire(now):
+    """Mark pending rows past their expiry dead and scrub them, failing their OTP status."""
+    keys = db.session.scalars(
+        sa.update(OutboxMessage)
+        .where(OutboxMessage.status == "pending", OutboxMessage.expires_at <= now)
+        .values(status="expired", claim_token=None, **SCRUBBED)
+        .returning(OutboxMessage.status_key)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    for key in keys:
+        if key:
+            otp_store.set_status(key, "failed")
+    return len(keys)
+
+
+def claim(batch_size, lease):
+    """Lease up to ``batch_size`` due rows to this worker and return them.
+
+    One UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING,
+    so concurrent drainers on PostgreSQL never wait on or double-claim each
+    other's rows. SQLite ignores FOR UPDATE, but its single writer makes the
+    statement atomic just the same. A claimed row's available_at moves to
+    the end of the lease: a worker that dies mid-batch only delays its rows.
+    """
+    now = datetime.now()
+    token = uuid.uuid4().hex
+    due = (
+        sa.select(OutboxMessage.id)
+        .where(OutboxMessage.status == "pending", OutboxMessage.available_at <= now,
+               sa.or_(OutboxMessage.expires_at.is_(None), OutboxMessage.expires_at > now))
+        .order_by(OutboxMessage.available_at, OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.session.execute(
+        sa.update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due.scalar_subquery()))
+        .values(claim_token=token, available_at=now + lease, attempts=OutboxMessage.attempts + 1)
+        .returning(OutboxMessage.id, OutboxMessage.channel, OutboxMessage.recipient,
+                   OutboxMessage.subject, OutboxMessage.html, OutboxMessage.text,
+                   OutboxMessage.status_key, OutboxMessage.attempts, OutboxMessage.expires_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return token, sorted(rows, key=lambda row: row.id)
+
+
+def _deliver(rows, engine):
+    """Send claimed rows; returns ``{id: error or None}``."""
+    emails = [row for row in rows if row.channel == "email"]
+    texts = [row for row in rows if row.channel == "sms"]
+    outcome = {}
+
+    results = engine.send_emails([
+        {"to": row.recipient, "subject": row.subject, "html": row.html, "text": row.text}
+        for row in emails
+    ])
+    for row, result in zip(emails, results):
+        outcome[row.id] = result.get("error", "delivery failed") if result["status"] == "error" else None
+
+    # Same-text SMS share a gateway call and results come back per number, so
+    # each round holds a number at most once: rows queued twice for the same
+    # number are each sent, not settled by one send
+    rounds = []
+    for row in texts:
+        for batch in rounds:
+            if row.recipient not in batch:
+                break
+        else:
+            batch = {}
+            rounds.append(batch)
+        batch[row.recipient] = row
+    for batch in rounds:
+        for row in batch.values():
+            outcome[row.id] = "delivery failed"
+        for result in engine.send_sms_batch([(row.recipient, row.text) for row in batch.values()]):
+            error = None if sms_delivered(result) else str(result.get("error", result["status"]))
+            for number in result["to"]:
+                if number in batch:
+                    outcome[batch[number].id] = error
+    return outcome
+
+
+def drain_once(engine, batch_size=100, lease=timedelta(minutes=5), max_attempts=5,
+               backoff=timedelta(seconds=30)):
+    """Claim and send one batch. Returns counts of sent, retried, failed and expired rows."""
+    counts = Counter()
+    expired = expire(datetime.now())
+    if expired:
+        counts["expired"] += expired
+    token, rows = claim(batch_size, lease)
+    if not rows:
+        return counts
+
+    outcome = _deliver(rows, engine)
+    now = datetime.now()
+    mine = OutboxMessage.claim_token == token
+
+    sent = [row for row in rows if outcome[row.id] is None]
+    if sent:
+        db.session.execute(sa.delete(OutboxMessage).where(
+            OutboxMessage.id.in_([row.id for row in sent]), mine))
+    given_up = set()
+    for row in rows:
+        error = outcome[row.id]
+        if error is None:
+            continue
+        # Exponential backoff with jitter between attempts
+        retry_at = now + backoff * (2 ** (row.attempts - 1)) * random.uniform(0.5, 1.5)
+        if row.expires_at is not None and retry_at >= row.expires_at:
+            values = {"status": "expired", **SCRUBBED}
+            counts["expired"] += 1
+        elif row.attempts >= max_attempts:
+            values = {"status": "failed", **(SCRUBBED if row.expires_at is not None else {})}
+            counts["failed"] += 1
+        else:
+            values = {"available_at": retry_at}
+            counts["retried"] += 1
+        if "status" in values:
+            given_up.add(row.id)
+        db.session.execute(
+            sa.update(OutboxMessage)
+            .where(OutboxMessage.id == row.id, mine)
+            .values(claim_token=None, last_error=error[:1000], **values)
+        )
+    db.session.commit()
+    if sent:
+        counts["sent"] += len(sent)
+
+    for row in rows:
+        if row.status_key and (outcome[row.id] is None or row.id in given_up):
+            otp_store.set_status(row.status_key, "sent" if outcome[row.id] is None else "failed")
+    return counts
+
+
+def drain(engine, once=False, poll_interval=1.0, stop=None, **options):
+    """Drain until the outbox is empty (``once``) or until ``stop`` is set."""
+    totals = Counter()
+    while not (stop and stop.is_set()):
+        counts = drain_once(engine, **options)
+        totals.update(counts)
+        if counts:
+            logger.info("Outbox batch: %s", dict(counts))
+            continue
+        if once:
+            break
+        if stop:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+    return totals
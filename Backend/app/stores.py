@@ -0,0 +1,353 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+## TTL KEY/VALUE STORES
+# Values are JSON-compatible dicts. Every backend expires entries on its own,
+# so abandoned keys never pile up, and pop() is an atomic get-and-delete.
+
+
+class MemoryStore:
+    """Per-process store; expiry is driven by a min-heap of deadlines."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def _sweep(self, now):
+        # Heap entries left behind by overwritten keys are skipped, only the
+        # deadline stored alongside the live value counts.
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == expires_at:
+                del self._data[key]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (ttl or self.ttl)
+        with self._lock:
+            self._sweep(now)
+            self._data[key] = (expires_at, value)
+            heapq.heappush(self._expiry, (expires_at, key))
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            entry = self._data.get(key)
+        return entry[1] if entry else None
+
+    def pop(self, key):
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            self._sweep(time.time())
+            return len(self._data)
+
+
+class LRUStore:
+    """Per-process store bounded to ``max_entries``, evicting least recently used.
+
+    ``on_evict(key)`` is called for every entry dropped by eviction or expiry.
+    """
+
+    def __init__(self, ttl, max_entries=1024, on_evict=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, key, value, ttl=None):
+        evicted = []
+        with self._lock:
+            self._data[key] = (time.time() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions += 1
+        self._evicted(evicted)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] > time.time():
+                self._data.move_to_end(key)
+                return entry[1]
+            del self._data[key]
+        self._evicted([key])
+        return None
+
+    def _evicted(self, keys):
+        # Called outside the lock so the callback may take its own
+        if self.on_evict:
+            for key in keys:
+                self.on_evict(key)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry and entry[0] > time.time() else None
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """Store shared by every worker on the host through one SQLite file."""
+
+    def __init__(self, path, ttl, table="kv_store"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_expires_at ON {table} (expires_at)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + (ttl or self.ttl)),
+            )
+
+    def get(self, key):
+        row = self._conn().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, key):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        return json.loads(row[0]) if row[1] > now else None
+
+    def delete(self, key):
+        with self._transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self):
+        return self._conn().execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE takes the write lock up front, which is what makes the
+    # select-then-delete in pop() atomic across processes.
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class RedisStore:
+    """Store shared across hosts through any server speaking the Redis protocol."""
+
+    def __init__(self, url, ttl, prefix="duemate:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis store backend needs the 'redis' package installed.")
+        self.ttl = ttl
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl or self.ttl))
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def pop(self, key):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(self.prefix + key)
+        pipe.delete(self.prefix + key)
+        raw, _ = pipe.execute()
+        return json.loads(raw) if raw else None
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def create_store(backend, ttl, url=None, namespace="kv_store"):
+    if backend == "memory":
+        return MemoryStore(ttl)
+    if backend == "sqlite":
+        path = url or os.path.join(os.path.dirname(os.path.dirname(__file__)), "store.db")
+        return SQLiteStore(path, ttl, table=namespace)
+    if backend == "redis":
+        return RedisStore(url or "redis://localhost:6379/0", ttl, prefix=f"duemate:{namespace}:")
+    raise ValueError(f"Unknown store backend: {backend!r}")
+
+
+class OTPStore:
+    """Flask extension wrapping the store selected by OTP_STORE_BACKEND."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_store(
+            app.config["OTP_STORE_BACKEND"],
+            app.config["OTP_TTL_SECONDS"],
+            url=app.config["OTP_STORE_URL"],
+            namespace="otp_store",
+        )
+        app.extensions["otp_store"] = self
+
+    def set(self, identifier, otp):
+        self.backend.set(identifier, {"otp": otp, "time": time.time()})
+
+    def pop(self, identifier):
+        return self.backend.pop(identifier)
+
+    # Delivery status lives under its own key, the request id login hands
+    # out, so verifying the OTP leaves it alone
+    def set_status(self, request_id, status):
+        self.backend.set("status:" + request_id, {"delivery": status})
+
+    def get_status(self, request_id):
+        entry = self.backend.get("status:" + request_id)
+        return entry["delivery"] if entry else None
+
+
+class ListingCache:
+    """Cache of rendered payment listings, selected by LISTING_CACHE_BACKEND.
+
+    Keys embed the owner's data version (see app.main.versions), so any write
+    to a user's payments makes their old entries unreachable on every worker;
+    TTL and LRU eviction reclaim them. With the memory backend, invalidate()
+    additionally frees the entries this process stored for them right away.
+    Only keys still held by the LRU are tracked, so tracking stays within
+    LISTING_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self._scopes = {}
+        self._key_scopes = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config["LISTING_CACHE_BACKEND"]
+        ttl = app.config["LISTING_CACHE_TTL"]
+        if backend == "none":
+            self.backend = None
+        elif backend == "memory":
+            self.backend = LRUStore(ttl, app.config["LISTING_CACHE_MAX_ENTRIES"], on_evict=self._forget)
+        else:
+            self.backend = create_store(backend, ttl, url=app.config["LISTING_CACHE_URL"],
+                                        namespace="listing_cache")
+        app.extensions["listing_cache"] = self
+
+    @property
+    def evictions(self):
+        return getattr(self.backend, "evictions", 0)
+
+    def get(self, key):
+        entry = self.backend.get(key) if self.backend is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry["body"]
+
+    def set(self, key, body, scope):
+        if self.backend is None:
+            return
+        if isinstance(self.backend, LRUStore):
+            with self._lock:
+                self._forget_locked(key)
+                self._key_scopes[key] = scope
+                self._scopes.setdefault(scope, set()).add(key)
+        self.backend.set(key, {"body": body})
+
+    def _forget(self, key):
+        with self._lock:
+            self._forget_locked(key)
+
+    def _forget_locked(self, key):
+        scope = self._key_scopes.pop(key, None)
+        keys = self._scopes.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[scope]
+
+    def invalidate(self, *scopes):
+        # The unscoped (all users) listing changes along with any user's
+        for scope in set(scopes) | {None}:
+            with self._lock:
+                keys = self._scopes.pop(scope, ())
+                for key in keys:
+                    self._key_scopes.pop(key, None)
+            for key in keys:
+                self.backend.delete(key)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,326 @@
+import sqlalchemy as sa
+
+
+## DATABASE-SIDE BOOKKEEPING
+# Triggers keep derived tables in step with `payment` inside the same
+# transaction as the write, whichever code path (ORM, bulk insert, set-based
+# UPDATE/DELETE) made it. Migrations carry their own copy of these statements.
+
+SQLITE_SUMMARY_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_summary_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total)
+        VALUES (NEW.user_id, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (user_id, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_summary_delete AFTER DELETE ON payment BEGIN
+        UPDATE payment_summary SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE user_id = OLD.user_id AND status = OLD.status AND category = OLD.category;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_summary_update AFTER UPDATE OF user_id, status, category, amount ON payment BEGIN
+        UPDATE payment_summary SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE user_id = OLD.user_id AND status = OLD.status AND category = OLD.category;
+        INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total)
+        VALUES (NEW.user_id, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (user_id, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+]
+
+POSTGRES_SUMMARY_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION payment_summary_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE payment_summary SET
+                payment_count = payment_count - 1,
+                amount_total = amount_total - OLD.amount
+            WHERE user_id = OLD.user_id AND status = OLD.status::text AND category = OLD.category::text;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total)
+            VALUES (NEW.user_id, NEW.status::text, NEW.category::text, 1, NEW.amount)
+            ON CONFLICT (user_id, status, category) DO UPDATE SET
+                payment_count = payment_summary.payment_count + 1,
+                amount_total = payment_summary.amount_total + EXCLUDED.amount_total;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_summary_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, status, category, amount ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_summary_apply()
+    """,
+]
+
+
+# The same counters summed over all users for anonymous listings, in
+# payment_total. Like the all users data version below, they are split into
+# SUMMARY_STRIPES stripes by user id so writers of different users rarely
+# update the same row; readers sum at most one row per stripe.
+SUMMARY_STRIPES = 16
+
+
+def summary_stripe(user_id):
+    # DDL() %-formats its statement
+    return f"{user_id} %% {SUMMARY_STRIPES}"
+
+
+SQLITE_TOTAL_TRIGGERS = [
+    f"""
+    CREATE TRIGGER payment_total_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_total (stripe, status, category, payment_count, amount_total)
+        VALUES ({summary_stripe('NEW.user_id')}, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (stripe, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+    f"""
+    CREATE TRIGGER payment_total_delete AFTER DELETE ON payment BEGIN
+        UPDATE payment_total SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE stripe = {summary_stripe('OLD.user_id')} AND status = OLD.status AND category = OLD.category;
+    END
+    """,
+    f"""
+    CREATE TRIGGER payment_total_update AFTER UPDATE OF user_id, status, category, amount ON payment BEGIN
+        UPDATE payment_total SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE stripe = {summary_stripe('OLD.user_id')} AND status = OLD.status AND category = OLD.category;
+        INSERT INTO payment_total (stripe, status, category, payment_count, amount_total)
+        VALUES ({summary_stripe('NEW.user_id')}, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (stripe, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+]
+
+POSTGRES_TOTAL_TRIGGERS = [
+    f"""
+    CREATE OR REPLACE FUNCTION payment_total_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE payment_total SET
+                payment_count = payment_count - 1,
+                amount_total = amount_total - OLD.amount
+            WHERE stripe = {summary_stripe('OLD.user_id')}
+                AND status = OLD.status::text AND category = OLD.category::text;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO payment_total (stripe, status, category, payment_count, amount_total)
+            VALUES ({summary_stripe('NEW.user_id')}, NEW.status::text, NEW.category::text, 1, NEW.amount)
+            ON CONFLICT (stripe, status, category) DO UPDATE SET
+                payment_count = payment_total.payment_count + 1,
+                amount_total = payment_total.amount_total + EXCLUDED.amount_total;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_total_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, status, category, amount ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_total_apply()
+    """,
+]
+
+
+# Data version per user (scope_id = user id), bumped on every payment write.
+# Listing ETags are derived from it. The "all users" version is the sum of
+# VERSION_STRIPES stripe rows (scope_id -1 to -VERSION_STRIPES, picked by
+# user id) rather than one row every writer would queue on: writers of
+# different users rarely share a stripe, and the sum still moves on every
+# write while staying a constant-size read.
+VERSION_STRIPES = 16
+
+
+def version_stripe(user_id):
+    # DDL() %-formats its statement
+    return f"-1 - {user_id} %% {VERSION_STRIPES}"
+
+
+SQLITE_VERSION_TRIGGERS = [
+    f"""
+    CREATE TRIGGER payment_version_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version)
+        VALUES (NEW.user_id, 1), ({version_stripe('NEW.user_id')}, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER payment_version_update AFTER UPDATE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version)
+        VALUES (OLD.user_id, 1), ({version_stripe('OLD.user_id')}, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT NEW.user_id, 1 WHERE NEW.user_id != OLD.user_id
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER payment_version_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version)
+        VALUES (OLD.user_id, 1), ({version_stripe('OLD.user_id')}, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+]
+
+POSTGRES_VERSION_TRIGGERS = [
+    f"""
+    CREATE OR REPLACE FUNCTION payment_version_bump() RETURNS trigger AS $$
+    DECLARE
+        scopes integer[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            scopes := ARRAY[NEW.user_id, {version_stripe('NEW.user_id')}];
+        ELSIF TG_OP = 'DELETE' OR NEW.user_id = OLD.user_id THEN
+            scopes := ARRAY[OLD.user_id, {version_stripe('OLD.user_id')}];
+        ELSE
+            scopes := ARRAY[OLD.user_id, NEW.user_id, {version_stripe('OLD.user_id')}];
+        END IF;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT scope, 1 FROM unnest(scopes) AS scope
+        ON CONFLICT (scope_id) DO UPDATE SET version = payment_version.version + 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_version_bump()
+    """,
+]
+
+# Change feed for the reminder scheduler: one payment_change row per write
+# that can move a reminder (new or deleted payment, deadline, owner, or a
+# status change into or out of unpaid), written only while the change_feed
+# row of feature_flag is on (flask cron change-feed). The scheduler consumes
+# it, deleting rows as it applies them.
+SQLITE_CHANGE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_change_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_change (payment_id)
+        SELECT NEW.id WHERE EXISTS (SELECT 1 FROM feature_flag WHERE name = 'change_feed' AND enabled);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_change_update AFTER UPDATE OF user_id, deadline, status ON payment
+    WHEN NEW.deadline IS NOT OLD.deadline OR NEW.user_id IS NOT OLD.user_id
+        OR (NEW.status IN ('pending', 'overdue')) != (OLD.status IN ('pending', 'overdue'))
+    BEGIN
+        INSERT INTO payment_change (payment_id)
+        SELECT NEW.id WHERE EXISTS (SELECT 1 FROM feature_flag WHERE name = 'change_feed' AND enabled);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_change_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_change (payment_id)
+        SELECT OLD.id WHERE EXISTS (SELECT 1 FROM feature_flag WHERE name = 'change_feed' AND enabled);
+    END
+    """,
+]
+
+POSTGRES_CHANGE_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION payment_change_log() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM feature_flag WHERE name = 'change_feed' AND enabled) THEN
+            INSERT INTO payment_change (payment_id)
+            VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_change_write_trigger
+    AFTER INSERT OR DELETE ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_change_log()
+    """,
+    """
+    CREATE TRIGGER payment_change_update_trigger
+    AFTER UPDATE OF user_id, deadline, status ON payment
+    FOR EACH ROW WHEN (
+        NEW.deadline IS DISTINCT FROM OLD.deadline OR NEW.user_id IS DISTINCT FROM OLD.user_id
+        OR (NEW.status IN ('pending', 'overdue')) <> (OLD.status IN ('pending', 'overdue'))
+    )
+    EXECUTE FUNCTION payment_change_log()
+    """,
+]
+
+# Full-text search over payment_name/description. SQLite uses an
+# external-content FTS5 table fed by triggers; PostgreSQL uses a generated
+# tsvector column with a GIN index, which the database keeps current itself.
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE payment_fts USING fts5(
+        payment_name, description, content='payment', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER payment_fts_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_fts (rowid, payment_name, description)
+        VALUES (NEW.id, NEW.payment_name, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_fts_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_fts (payment_fts, rowid, payment_name, description)
+        VALUES ('delete', OLD.id, OLD.payment_name, OLD.description);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_fts_update AFTER UPDATE OF payment_name, description ON payment BEGIN
+        INSERT INTO payment_fts (payment_fts, rowid, payment_name, description)
+        VALUES ('delete', OLD.id, OLD.payment_name, OLD.description);
+        INSERT INTO payment_fts (rowid, payment_name, description)
+        VALUES (NEW.id, NEW.payment_name, NEW.description);
+    END
+    """,
+]
+
+POSTGRES_SEARCH_DDL = [
+    """
+    ALTER TABLE payment ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(payment_name, '') || ' ' || coalesce(description, ''))
+    ) STORED
+    """,
+    "CREATE INDEX ix_payment_search_vector ON payment USING GIN (search_vector)",
+]
+
+
+def register(metadata):
+    # Fires once every table exists, so triggers may reference any of them
+    for statement in (SQLITE_SUMMARY_TRIGGERS + SQLITE_TOTAL_TRIGGERS + SQLITE_VERSION_TRIGGERS
+                      + SQLITE_CHANGE_TRIGGERS + SQLITE_SEARCH_DDL):
+        sa.event.listen(metadata, "after_create", sa.DDL(statement).execute_if(dialect="sqlite"))
+    for statement in (POSTGRES_SUMMARY_TRIGGERS + POSTGRES_TOTAL_TRIGGERS + POSTGRES_VERSION_TRIGGERS
+                      + POSTGRES_CHANGE_TRIGGERS + POSTGRES_SEARCH_DDL):
+        sa.event.listen(metadata, "after_create", sa.DDL(statement).execute_if(dialect="postgresql"))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Keep autogenerate from dropping the objects created by the raw DDL above
+    if reflected and compare_to is None and name:
+        return not (name.startswith("payment_fts") or name in ("search_vector", "ix_payment_search_vector"))
+    return True
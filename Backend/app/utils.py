@@ -2,10 +2,14 @@ import requests
 import json
 import os
 from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
 from flask import current_app
 import resend
 from datetime import datetime
 from flask_jwt_extended import create_access_token
+from app import metrics
 
 DEMO_MODE = os.getenv("DEMO_MODE", "false").lower() == "true"
 
@@ -24,29 +28,248 @@ def send_email(to: str, subject: str, html: str, text: str = ""):
 
 
 import smtplib
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from email.message import EmailMessage
 
-def _send_real_email(to: str, subject: str, html: str, text: str = ""):
+
+def send_emails(messages):
+    """Send many emails over one pooled SMTP session.
+
+    ``messages`` is an iterable of dicts with ``to``, ``subject``, ``html`` and
+    optional ``text`` keys. A failing message does not stop the rest; one result
+    dict is returned per message, in order.
+    """
+    if DEMO_MODE:
+        return [_send_demo_email(m["to"], m["subject"], m["html"], m.get("text", ""))
+                for m in messages]
+
+    sender = current_app.config["EMAIL_HOST_USER"]
+    results = []
+    with _get_smtp_pool().session() as session:
+        for m in messages:
+            if not all([m.get("to"), m.get("subject"), m.get("html")]):
+                results.append({"status": "error", "to": m.get("to"),
+                                "error": "Recipient, subject, and HTML body are required."})
+                continue
+            try:
+                session.send(_build_email(sender, m["to"], m["subject"], m["html"], m.get("text", "")))
+                results.append({"status": "success", "to": m["to"]})
+            except Exception as e:
+                results.append({"status": "error", "to": m["to"], "error": str(e)})
+    return results
+
+
+def deliver_email(message, provider="smtp"):
+    """Send one email dict through ``provider`` ("smtp" or "resend").
+
+    Unlike send_emails this lets the provider's own exceptions through, so
+    callers such as app/cron/delivery.py can tell transient failures from
+    permanent ones.
+    """
+    if DEMO_MODE:
+        return _send_demo_email(message["to"], message["subject"], message["html"],
+                                message.get("text", ""))
+    if provider == "resend":
+        return _send_resend_email(message)
+
+    sender = current_app.config["EMAIL_HOST_USER"]
+    with _get_smtp_pool().session() as session:
+        session.send(_build_email(sender, message["to"], message["subject"], message["html"],
+                                  message.get("text", "")))
+    return {"status": "success", "to": message["to"]}
+
+
+def _send_resend_email(message):
+    config = current_app.config
+    resend.api_key = config["RESEND_API_KEY"]
+    params = {
+        "from": config["RESEND_SENDER"],
+        "to": [message["to"]],
+        "subject": message["subject"],
+        "html": message["html"],
+    }
+    if message.get("text"):
+        params["text"] = message["text"]
+    with metrics.provider_timer("resend"):
+        sent = resend.Emails.send(params)
+    return {"status": "success", "to": message["to"], "id": sent["id"]}
+
+
+def _build_email(sender, to, subject, html, text=""):
     msg = EmailMessage()
     msg["Subject"] = subject
-    msg["From"] = current_app.config["EMAIL_HOST_USER"]
+    msg["From"] = sender
     msg["To"] = to
     msg.set_content(text or "This email needs an HTML client.")
     msg.add_alternative(html, subtype='html')
+    return msg
+
+
+def _send_real_email(to: str, subject: str, html: str, text: str = ""):
+    msg = _build_email(current_app.config["EMAIL_HOST_USER"], to, subject, html, text)
 
     try:
-        with smtplib.SMTP(current_app.config["EMAIL_HOST"], current_app.config["EMAIL_PORT"]) as server:
-            if current_app.config["EMAIL_USE_TLS"]:
-                server.starttls()
-            server.login(
-                current_app.config["EMAIL_HOST_USER"],
-                current_app.config["EMAIL_HOST_PASSWORD"]
-            )
-            server.send_message(msg)
+        with _get_smtp_pool().session() as session:
+            session.send(msg)
         return {"status": "success"}
     except Exception as e:
         raise RuntimeError(f"Failed to send email: {e}")
-    
+
+
+class SMTPPool:
+    """Keeps authenticated SMTP connections open between sends.
+
+    At most ``size`` connections exist at once. A connection that sat idle
+    longer than ``idle_timeout`` is dropped, one idle for a few seconds is
+    checked with NOOP before it is reused.
+    """
+
+    HEALTHCHECK_AFTER = 5
+
+    def __init__(self, host, port, user, password, use_tls=True, size=4,
+                 idle_timeout=60, timeout=10):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            server.login(self.user, self.password)
+        except Exception:
+            _close_quietly(server)
+            raise
+        return server
+
+    def _checkout(self):
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.idle_timeout:
+                _close_quietly(server)
+            elif idle_for > self.HEALTHCHECK_AFTER and not _is_alive(server):
+                _close_quietly(server)
+            else:
+                return server
+
+    def _checkin(self, server):
+        self._idle.put((server, time.monotonic()))
+
+    @contextmanager
+    def session(self):
+        self._slots.acquire()
+        session = None
+        try:
+            session = _SMTPSession(self, self._checkout())
+            yield session
+        finally:
+            if session is not None and session.server is not None:
+                self._checkin(session.server)
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(server)
+
+
+class _SMTPSession:
+    def __init__(self, pool, server):
+        self.pool = pool
+        self.server = server
+
+    def send(self, msg):
+        with metrics.provider_timer("smtp"):
+            if self.server is None:
+                # An earlier reconnect failed; this message gets a fresh try
+                self.server = self.pool.connect()
+            try:
+                self.server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._reconnect_and_send(msg)
+            except smtplib.SMTPException:
+                # Refused sender/recipients: smtplib already reset the transaction
+                raise
+            except OSError:
+                self._reconnect_and_send(msg)
+
+    def _reconnect_and_send(self, msg):
+        # The server dropped us mid-session, reconnect once and retry. Only a
+        # connection that works is kept, so a broken one never goes back to
+        # the pool
+        _close_quietly(self.server)
+        self.server = None
+        server = self.pool.connect()
+        try:
+            server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            _close_quietly(server)
+            raise
+        except smtplib.SMTPException:
+            self.server = server
+            raise
+        except OSError:
+            _close_quietly(server)
+            raise
+        self.server = server
+
+
+def _is_alive(server):
+    try:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+_smtp_pool = None
+_smtp_pool_lock = threading.Lock()
+
+
+def _get_smtp_pool():
+    global _smtp_pool
+    if _smtp_pool is None:
+        with _smtp_pool_lock:
+            if _smtp_pool is None:
+                config = current_app.config
+                _smtp_pool = SMTPPool(
+                    config["EMAIL_HOST"],
+                    config["EMAIL_PORT"],
+                    config["EMAIL_HOST_USER"],
+                    config["EMAIL_HOST_PASSWORD"],
+                    use_tls=config["EMAIL_USE_TLS"],
+                    size=config["EMAIL_POOL_SIZE"],
+                    idle_timeout=config["EMAIL_POOL_IDLE_TIMEOUT"],
+                    timeout=config["EMAIL_TIMEOUT"],
+                )
+    return _smtp_pool
+
 def _send_demo_email(to, subject, html, text=""):
     print(f"\n[DEMO EMAIL]")
     print(f"To: {to}")
@@ -76,34 +299,166 @@ def send_sms(to_number: str, message_text: str) -> dict:
     else:
         return _send_real_sms(to_number, message_text)
 
+def sms_delivered(result) -> bool:
+    """Whether an SMS result dict means the gateway took the message (any 2xx)."""
+    status = result.get("status")
+    if status == "demo-success":
+        return True
+    return isinstance(status, int) and 200 <= status < 300
+
+def send_sms_batch(messages) -> list:
+    """Send ``(to_number, message_text)`` pairs with as few gateway calls as possible.
+
+    Recipients sharing the exact same text go out together in one request of up
+    to SMS_BATCH_SIZE numbers. One result dict is returned per gateway call,
+    plus one per rejected number.
+    """
+    results, calls = group_sms(messages)
+    for chunk, message_text in calls:
+        results.append(post_sms_chunk(chunk, message_text))
+    return results
+
+
+def group_sms(messages):
+    """Split ``(to_number, message_text)`` pairs into gateway calls.
+
+    Returns ``(rejected, calls)``: result dicts for numbers without a country
+    code, and ``(numbers, text)`` calls of up to SMS_BATCH_SIZE numbers that
+    share the same text.
+    """
+    rejected = []
+    by_text = {}
+    for to_number, message_text in messages:
+        if not to_number or not to_number.startswith("+"):
+            rejected.append({"status": 400, "to": [to_number],
+                             "error": "Phone number must include country code, e.g. +91"})
+            continue
+        # dict keys keep insertion order and drop duplicate numbers
+        by_text.setdefault(message_text, {})[to_number] = None
+
+    batch_size = current_app.config["SMS_BATCH_SIZE"]
+    calls = []
+    for message_text, numbers in by_text.items():
+        numbers = list(numbers)
+        for i in range(0, len(numbers), batch_size):
+            calls.append((numbers[i:i + batch_size], message_text))
+    return rejected, calls
+
+
+def post_sms_chunk(numbers, message_text, retry=True):
+    """Send one gateway call; ``retry=False`` leaves retrying to the caller."""
+    if DEMO_MODE:
+        result = _send_demo_sms(", ".join(numbers), message_text)
+    else:
+        result = _post_sms(numbers, message_text, retry)
+    result["to"] = numbers
+    return result
+
+
 def _send_real_sms(to_number: str, message_text: str) -> dict:
-    sms = current_app.config["SMS_GATEWAY_CONFIG"]
     if not to_number.startswith("+"):
         return {"status": 400, "error": "Phone number must include country code, e.g. +91"}
 
+    return _post_sms([to_number], message_text)
+
+
+def _post_sms(phone_numbers: list, message_text: str, retry: bool = True) -> dict:
+    sms = current_app.config["SMS_GATEWAY_CONFIG"]
+
     payload = {
         "textMessage": {"text": message_text},
-        "phoneNumbers": [to_number]
+        "phoneNumbers": phone_numbers
     }
 
     try:
-        response = requests.post(
-            sms["url"],
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(payload),
-            auth=HTTPBasicAuth(sms["username"], sms["password"]),
-            timeout=5
-        )
-        response.raise_for_status()
+        with metrics.provider_timer("sms"):
+            response = _get_sms_session(retry).post(
+                sms["url"],
+                data=json.dumps(payload),
+                timeout=current_app.config["SMS_TIMEOUT"]
+            )
+            response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        # Keep the gateway's own status, so a 400 or 401 is not retried
         return {
-            "status": response.status_code,
-            "data": response.json()
+            "status": e.response.status_code,
+            "error": str(e)
+        }
+    except requests.exceptions.ReadTimeout as e:
+        # The gateway may have accepted the message before timing out
+        return {
+            "status": "timeout",
+            "error": str(e)
         }
     except requests.exceptions.RequestException as e:
         return {
-            "status": 500,
+            "status": "unreachable" if _never_sent(e) else 500,
             "error": str(e)
         }
+
+    # The status decides delivery; an empty or non-JSON body on a 2xx does not
+    # make an accepted message a failure
+    try:
+        data = response.json() if response.content else None
+    except ValueError:
+        data = None
+    return {
+        "status": response.status_code,
+        "data": data
+    }
+
+
+def _never_sent(exc):
+    """Whether a requests error happened before the request reached the gateway."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(exc, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+_sms_sessions = {}
+_sms_session_lock = threading.Lock()
+
+
+def _get_sms_session(retry=True):
+    # One keep-alive session per process and retry mode; urllib3 retries
+    # refused connections and throttled/unavailable responses with
+    # exponential backoff. A POST is not idempotent: a read timeout, 502 or
+    # 504 may arrive after the gateway accepted the message, so those are
+    # never retried. Callers with their own retry loop (the delivery engine)
+    # use the session without urllib3 retries, so attempts do not multiply.
+    session = _sms_sessions.get(retry)
+    if session is None:
+        with _sms_session_lock:
+            session = _sms_sessions.get(retry)
+            if session is None:
+                config = current_app.config
+                sms = config["SMS_GATEWAY_CONFIG"]
+                if retry:
+                    retries = Retry(
+                        total=config["SMS_MAX_RETRIES"],
+                        read=0,
+                        backoff_factor=0.5,
+                        status_forcelist=(429, 503),
+                        allowed_methods=frozenset({"POST"}),
+                        respect_retry_after_header=True,
+                        raise_on_status=False,
+                    )
+                else:
+                    retries = Retry(total=0, raise_on_status=False)
+                adapter = HTTPAdapter(
+                    pool_connections=config["SMS_POOL_CONNECTIONS"],
+                    pool_maxsize=config["SMS_POOL_MAXSIZE"],
+                    max_retries=retries,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({"Content-Type": "application/json"})
+                session.auth = HTTPBasicAuth(sms["username"], sms["password"])
+                _sms_sessions[retry] = session
+    return session
+
     
 def _send_demo_sms(to_number: str, message_text: str) -> dict:
     print(f"\n[DEMO SMS]")
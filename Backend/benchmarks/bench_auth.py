@@ -0,0 +1,31 @@
+"""POST /api/auth/login and /api/auth/verify_otp."""
+import pytest
+from app import otp_store
+
+OTP = "123456"
+
+
+@pytest.mark.benchmark(group="auth")
+def bench_login_dispatcher(benchmark, client, user_email):
+    response = benchmark(client.post, "/api/auth/login", json={"email": user_email})
+    assert response.status_code == 202
+
+
+@pytest.mark.benchmark(group="auth")
+def bench_login_outbox(benchmark, app, client, user_email, monkeypatch):
+    monkeypatch.setitem(app.config, "OUTBOX_ENABLED", True)
+    response = benchmark(client.post, "/api/auth/login", json={"email": user_email})
+    assert response.status_code == 202
+
+
+@pytest.mark.benchmark(group="auth")
+def bench_verify_otp(benchmark, client, user_email):
+    # Every verification consumes the OTP, so each round stores a fresh one
+    def setup():
+        otp_store.set(user_email, OTP)
+
+    response = benchmark.pedantic(
+        client.post, args=("/api/auth/verify_otp",), kwargs={"json": {"email": user_email, "otp": OTP}},
+        setup=setup, rounds=200, warmup_rounds=5,
+    )
+    assert response.status_code == 200
@@ -0,0 +1,43 @@
+"""The reminder due-payment scan, without rendering or delivery."""
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from app import db
+from app.cron.due_list import iter_due_payments
+from app.cron.reminders import WINDOWS, _window_scans
+from app.models import Payment, ReminderWatermark
+
+# The scans query through db.session, so they need the app context
+pytestmark = pytest.mark.usefixtures("app")
+
+
+def window_scans(watermark=None, full=False):
+    # The separate range scans run_reminders() hands to iter_due_payments()
+    now = datetime.now()
+    max_id = db.session.scalar(sa.select(sa.func.max(Payment.id)))
+    return [sa.and_(*bounds) for window in WINDOWS
+            for bounds in _window_scans(window, watermark, now, full, max_id)]
+
+
+def scan(*scans):
+    return sum(len(chunk["email"]) + len(chunk["sms"]) for chunk in iter_due_payments(*scans))
+
+
+@pytest.mark.benchmark(group="due scan")
+def bench_due_scan_lead_time(benchmark):
+    assert benchmark(scan) > 0
+
+
+@pytest.mark.benchmark(group="due scan")
+def bench_due_scan_full(benchmark):
+    # What `flask cron reminders --full` reads
+    assert benchmark(scan, *window_scans(full=True)) > 0
+
+
+@pytest.mark.benchmark(group="due scan")
+def bench_due_scan_incremental(benchmark):
+    # A scheduled run an hour after the previous one, with no new payments
+    watermark = ReminderWatermark(scanned_until=datetime.now() - timedelta(hours=1),
+                                  last_payment_id=db.session.scalar(sa.select(sa.func.max(Payment.id))))
+    benchmark(scan, *window_scans(watermark))
@@ -0,0 +1,36 @@
+"""GET /api/payments across filter, sort and pagination combinations."""
+import pytest
+
+LISTINGS = {
+    "default": {},
+    "status": {"status": "pending"},
+    "status+category": {"status": "pending", "category": "bills"},
+    "sort-amount-desc": {"sort_by": "amount", "sort_order": "desc"},
+    "sort-name": {"sort_by": "payment_name"},
+    "deep-page": {"page": 40, "per_page": 25},
+    "max-page": {"per_page": 100},
+    "cursor": {"cursor": ""},
+    "search": {"search": "electricity"},
+    "search-relevance": {"search": "loan", "sort_by": "relevance"},
+}
+
+
+@pytest.mark.benchmark(group="listing (all users)")
+@pytest.mark.parametrize("params", LISTINGS.values(), ids=LISTINGS.keys())
+def bench_listing_anonymous(benchmark, client, params):
+    response = benchmark(client.get, "/api/payments", query_string=params)
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group="listing (one user)")
+@pytest.mark.parametrize("params", LISTINGS.values(), ids=LISTINGS.keys())
+def bench_listing_signed_in(benchmark, signed_in_client, params):
+    response = benchmark(signed_in_client.get, "/api/payments", query_string=params)
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group="listing (one user)")
+def bench_listing_revalidation(benchmark, signed_in_client):
+    etag = signed_in_client.get("/api/payments").headers["ETag"]
+    response = benchmark(signed_in_client.get, "/api/payments", headers={"If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,50 @@
+"""Shared fixtures for the pytest-benchmark suite.
+
+    pytest benchmarks
+
+Dataset size comes from BENCH_USERS and BENCH_PAYMENTS_PER_USER (default
+200 x 50). Each run saves its results as JSON under .benchmarks/ (see
+pytest.ini); compare two runs with ``pytest-benchmark compare 0001 0002``.
+Importing datagen puts the app in DEMO_MODE, so nothing is sent for real.
+"""
+import os
+import tempfile
+
+import pytest
+from datagen import build, email_for
+
+USERS = int(os.getenv("BENCH_USERS", 200))
+PAYMENTS_PER_USER = int(os.getenv("BENCH_PAYMENTS_PER_USER", 50))
+
+
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    # Record the dataset alongside the timings so runs stay comparable
+    output_json["dataset"] = {"users": USERS, "payments_per_user": PAYMENTS_PER_USER}
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Measure the queries themselves, not the listing cache
+    app = build(os.path.join(tempfile.mkdtemp(), "bench.db"), USERS, PAYMENTS_PER_USER,
+                LISTING_CACHE_BACKEND="none")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def signed_in_client(app):
+    # User 2 has both an email and a phone number
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "2"
+    return client
+
+
+@pytest.fixture
+def user_email():
+    return email_for(0)
@@ -0,0 +1,147 @@
+"""Deterministic synthetic data for the benchmark suite.
+
+Builds ``users`` users with ``payments_per_user`` payments each. The same
+seed always produces the same rows, so timings from different commits are
+measured against identical data. Distributions roughly follow real use:
+
+- a third of users have only an email, a third only a phone number and the
+  rest both, and one in four asked for digest reminders;
+- categories are skewed towards bills and subscriptions;
+- deadlines cluster within a month of today with a long tail either side;
+- status follows the deadline: past payments are mostly paid or overdue,
+  upcoming ones mostly pending;
+- amounts are log-normal, most between 10 and 2000.
+
+Run directly to build a database for the HTTP load test (see locustfile.py):
+
+    python benchmarks/datagen.py --db /tmp/duemate-bench.db --users 2000 --payments-per-user 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.utils reads this at import time; benchmarks must never reach a real
+# SMTP server or SMS gateway, whatever .env says
+os.environ["DEMO_MODE"] = "true"
+
+import sqlalchemy as sa
+from config import Config
+from app import create_app, db
+from app.models import User, Payment
+
+CATEGORIES = ["bills", "subscription", "loan", "tax", "other"]
+CATEGORY_WEIGHTS = [40, 30, 12, 8, 10]
+NAMES = {
+    "bills": ["electricity bill", "water bill", "internet", "phone bill", "gas"],
+    "subscription": ["streaming", "music", "gym membership", "cloud storage", "newspaper"],
+    "loan": ["car loan", "home loan", "student loan", "credit card"],
+    "tax": ["income tax", "property tax", "road tax"],
+    "other": ["rent", "school fees", "insurance", "donation"],
+}
+DESCRIPTIONS = [None, None, "monthly", "paid by card", "split with roommate", "auto debit"]
+INSERT_BATCH = 10000
+
+
+def email_for(i):
+    return f"user{i}@example.com"
+
+
+def phone_for(i):
+    return f"+91{9000000000 + i}"
+
+
+def generate_users(users, seed=1234):
+    rnd = random.Random(seed)
+    for i in range(users):
+        contact = i % 3
+        yield {
+            "email": email_for(i) if contact != 1 else None,
+            "phone_number": phone_for(i) if contact != 0 else None,
+            "reminder_digest": True if rnd.random() < 0.25 else None,
+        }
+
+
+def _status(rnd, days):
+    if days < 0:
+        return rnd.choices(["paid", "overdue", "cancelled"], [70, 25, 5])[0]
+    return rnd.choices(["pending", "paid", "cancelled"], [85, 12, 3])[0]
+
+
+def generate_payments(users, payments_per_user, seed=1234, now=None):
+    """Payment rows for user ids 1..``users``, in insertion order."""
+    rnd = random.Random(seed + 1)
+    now = (now or datetime.now()).replace(microsecond=0)
+    for user_id in range(1, users + 1):
+        for _ in range(payments_per_user):
+            category = rnd.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+            days = rnd.gauss(0, 20) if rnd.random() < 0.8 else rnd.uniform(-365, 365)
+            yield {
+                "user_id": user_id,
+                "payment_name": rnd.choice(NAMES[category]),
+                "description": rnd.choice(DESCRIPTIONS),
+                "amount": round(min(rnd.lognormvariate(5, 1.2), 99999), 2),
+                "category": category,
+                "deadline": now + timedelta(days=days, minutes=rnd.randrange(24 * 60)),
+                "status": _status(rnd, days),
+            }
+
+
+def populate(users, payments_per_user, seed=1234):
+    """Insert the generated rows into the current app's database."""
+    db.session.execute(sa.insert(User), list(generate_users(users, seed)))
+    batch = []
+    for row in generate_payments(users, payments_per_user, seed):
+        batch.append(row)
+        if len(batch) == INSERT_BATCH:
+            db.session.execute(sa.insert(Payment), batch)
+            batch = []
+    if batch:
+        db.session.execute(sa.insert(Payment), batch)
+    db.session.commit()
+    db.session.execute(sa.text("ANALYZE"))
+
+
+def bench_config(path, **overrides):
+    """Config for an app on the SQLite file at ``path``, without rate limits."""
+    attrs = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "RATELIMIT_ENABLED": False,
+        "OTP_DISPATCH_QUEUE_SIZE": 100000,
+        **overrides,
+    }
+    return type("BenchConfig", (Config,), attrs)
+
+
+def build(path, users, payments_per_user, seed=1234, **overrides):
+    """Create, schema and seed a database at ``path``; returns the app."""
+    app = create_app(bench_config(path, **overrides))
+    with app.app_context():
+        db.create_all()
+        populate(users, payments_per_user, seed)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="SQLite file to create (default: a temp file)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--payments-per-user", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    if os.path.exists(path):
+        parser.error(f"{path} already exists")
+    started = time.perf_counter()
+    build(path, args.users, args.payments_per_user, args.seed)
+    print(f"seeded {args.users} users x {args.payments_per_user} payments into {path} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""HTTP load scenario for the app factory, run with Locust.
+
+Build a dataset, serve it through create_app() with rate limits off, then
+point Locust at it. ``--json`` prints the final per-endpoint stats as JSON
+so runs can be compared between commits:
+
+    python benchmarks/datagen.py --db /tmp/duemate-bench.db --users 2000
+    DATABASE_URL=sqlite:////tmp/duemate-bench.db DEMO_MODE=true RATELIMIT_ENABLED=false \\
+        gunicorn -w 4 'app:create_app()'
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 \\
+        --headless -u 100 -r 20 -t 2m --json > locust-results.json
+
+BENCH_USERS must match the --users the dataset was built with.
+"""
+import os
+import random
+
+from locust import HttpUser, between, task
+from datagen import CATEGORIES, NAMES, email_for, phone_for
+
+USERS = int(os.getenv("BENCH_USERS", 1000))
+SORTS = ["deadline", "amount", "payment_name", "status", "category"]
+STATUSES = ["pending", "paid", "overdue", "cancelled"]
+
+
+class DuemateUser(HttpUser):
+    """Mostly browses listings, occasionally asks for an OTP."""
+
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        self.etag = None
+        self.user_index = random.randrange(USERS)
+
+    @task(10)
+    def browse(self):
+        params = {"sort_by": random.choice(SORTS), "sort_order": random.choice(["asc", "desc"])}
+        if random.random() < 0.5:
+            params["status"] = random.choice(STATUSES)
+        if random.random() < 0.3:
+            params["category"] = random.choice(CATEGORIES)
+        if random.random() < 0.3:
+            params["page"] = random.randint(1, 20)
+        self.client.get("/api/payments", params=params, name="/api/payments [filtered]")
+
+    @task(5)
+    def revalidate(self):
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        with self.client.get("/api/payments", headers=headers, name="/api/payments [revalidate]",
+                             catch_response=True) as response:
+            if response.status_code in (200, 304):
+                self.etag = response.headers.get("ETag", self.etag)
+                response.success()
+
+    @task(3)
+    def page_through(self):
+        cursor = ""
+        for _ in range(5):
+            response = self.client.get("/api/payments", params={"cursor": cursor, "per_page": 25},
+                                       name="/api/payments [cursor]")
+            cursor = response.json()["data"]["pagination"]["next_cursor"] if response.ok else None
+            if not cursor:
+                break
+
+    @task(2)
+    def search(self):
+        term = random.choice(random.choice(list(NAMES.values()))).split()[0]
+        self.client.get("/api/payments", params={"search": term}, name="/api/payments [search]")
+
+    @task(1)
+    def login(self):
+        if self.user_index % 3 == 1:
+            identifier = {"phone_number": phone_for(self.user_index)}
+        else:
+            identifier = {"email": email_for(self.user_index)}
+        response = self.client.post("/api/auth/login", json=identifier)
+        if response.ok:
+            self.client.get("/api/auth/otp_status", params={"request_id": response.json()["request_id"]})
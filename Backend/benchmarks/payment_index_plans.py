@@ -0,0 +1,155 @@
+"""Check that every /api/payments filter/sort combination is index-backed.
+
+Seeds a throwaway SQLite database with datagen, then runs EXPLAIN QUERY PLAN and a timed
+execution for each combination the listing endpoint can produce, signed in
+and anonymous, plus the reminder due-date scans. Exits non-zero if any plan
+falls back to a full table scan, or walks an index while filtering columns
+it does not seek on (see is_index_backed).
+
+    python benchmarks/payment_index_plans.py --rows 200000
+"""
+import argparse
+import itertools
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from datagen import build
+from app import db
+from app.models import Payment, ReminderRetry, ReminderWatermark
+from app.cron.due_list import UNPAID, key_page
+from app.cron.reminders import WINDOWS, _window_scans
+from app.main.queries import payment_list_query, sort_key, apply_cursor
+from app.main.schema import PaymentFilterSchema
+
+SORT_COLUMNS = ["deadline", "amount", "payment_name", "status", "category"]
+
+
+def explain(query):
+    compiled = query.compile(db.engine, compile_kwargs={"literal_binds": True})
+    return [row[3] for row in db.session.execute(sa.text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+CONSTRAINT = re.compile(r"^SEARCH payment USING (?:COVERING )?(?:INDEX \S+|INTEGER PRIMARY KEY) \((.*)\)$")
+
+
+def payment_steps(plan):
+    return [step.strip() for step in plan if re.match(r"(SCAN|SEARCH) payment\b(?!_)", step.strip())]
+
+
+def is_index_backed(plan, filtered=()):
+    """Whether every access to payment seeks on the columns being filtered.
+
+    A bare "SCAN payment" is a full table scan and always fails. With no
+    filter, "SCAN payment USING INDEX ..." is fine: it walks the sort index
+    in order and stops at the page limit. With filters, the step has to be a
+    SEARCH whose leading constraint is on one of ``filtered``, otherwise the
+    index is walked and the filter checked row by row.
+    """
+    steps = payment_steps(plan)
+    if not steps or any(step == "SCAN payment" for step in steps):
+        return False
+    if not filtered:
+        return True
+    for step in steps:
+        match = CONSTRAINT.match(step)
+        if not match:
+            return False
+        leading = re.split(r"[=<>]| IN ", match.group(1))[0].strip()
+        if leading not in filtered:
+            return False
+    return True
+
+
+def listing_cases():
+    for user_id, status, category, sort_by, sort_order in itertools.product(
+            [None, 7], [None, "pending"], [None, "bills"], SORT_COLUMNS, ["asc", "desc"]):
+        filter_data = PaymentFilterSchema(status=status, category=category,
+                                          sort_by=sort_by, sort_order=sort_order)
+        label = f"user_id={user_id} status={status} category={category} sort={sort_by} {sort_order}"
+        # Filtered listings, signed in or anonymous, must seek on a filter
+        filtered = {name for name, value in
+                    (("user_id", user_id), ("status", status), ("category", category)) if value}
+        yield label, payment_list_query(filter_data, user_id=user_id).limit(10), filtered
+
+        # Same listing in cursor mode, seeking past a mid-table position
+        position = [datetime.now() if column.key == "deadline" else
+                    "m" if column.key in ("payment_name", "status", "category") else
+                    2500.0 if column.key == "amount" else 1
+                    for column in sort_key(filter_data)]
+        query = apply_cursor(payment_list_query(filter_data, user_id=user_id), filter_data, position)
+        yield f"{label} (cursor)", query.limit(11), filtered
+
+
+def search_cases():
+    for user_id, sort_by in itertools.product([None, 7], ["deadline", "relevance"]):
+        filter_data = PaymentFilterSchema(search="elec bill", sort_by=sort_by)
+        # Matches come from the full-text index and are fetched by rowid
+        yield (f"user_id={user_id} search='elec bill' sort={sort_by}",
+               payment_list_query(filter_data, user_id=user_id).limit(10), {"rowid", "user_id"})
+
+
+def due_scan_case():
+    # A key page of app.cron.due_list: must seek a (status, deadline) range
+    deadline = datetime.now() + timedelta(days=2)
+    return "due-payment scan", key_page(Payment.deadline <= deadline, after=(7, 0)), {"status", "deadline"}
+
+
+# An incremental reminder scan must seek a deadline or id range, never walk
+# an index in user order
+RANGE_START = re.compile(
+    r"SEARCH payment USING (INDEX ix_payment_(status_deadline|deadline_status)|INTEGER PRIMARY KEY) "
+    r"\((status=\? AND )?(deadline|rowid)[<>]")
+
+
+def starts_from_range(plan):
+    return bool(plan) and RANGE_START.match(plan[0].strip()) is not None
+
+
+def reminder_scan_cases():
+    now = datetime.now()
+    max_id = db.session.scalar(sa.select(sa.func.max(Payment.id)))
+    watermark = ReminderWatermark(scanned_until=now - timedelta(hours=1), last_payment_id=max_id - 100)
+    for window in WINDOWS:
+        for i, criteria in enumerate(_window_scans(window, watermark, now, max_id=max_id)):
+            yield f"incremental {window} reminder scan {i + 1}", key_page(sa.and_(*criteria)), starts_from_range
+    # Failed sends are looked up one primary key at a time
+    query = key_page(Payment.id.in_(sa.select(ReminderRetry.payment_id)))
+    yield "reminder retry scan", query, lambda plan: is_index_backed(plan, {"rowid"})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    payments_per_user = max(1, args.rows // args.users)
+    app = build(os.path.join(tempfile.mkdtemp(), "bench.db"), args.users, payments_per_user)
+    print(f"seeded {args.users * payments_per_user} payments in {time.perf_counter() - started:.1f}s\n")
+    failures = 0
+    with app.app_context():
+
+        cases = [(label, query, lambda plan, filtered=filtered: is_index_backed(plan, filtered))
+                 for label, query, filtered in [*listing_cases(), *search_cases(), due_scan_case()]]
+        for label, query, check in cases + list(reminder_scan_cases()):
+            plan = explain(query)
+            started = time.perf_counter()
+            db.session.execute(query).all()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            ok = check(plan)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {elapsed_ms:8.2f} ms  {label}")
+            print(f"      {' | '.join(plan)}")
+
+    print(f"\n{failures} combination(s) not index-backed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
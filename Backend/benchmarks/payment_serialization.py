@@ -0,0 +1,74 @@
+"""Per-row cost of serializing a 100-row /api/payments page.
+
+Compares the old path (hydrate ORM objects, build dicts, stdlib JSON via
+jsonify) with the shared serializer (column rows, payment_to_dict, orjson
+when installed) and reports microseconds per row for each stage.
+
+    python benchmarks/payment_serialization.py
+"""
+import argparse
+import json
+import os
+import tempfile
+import timeit
+
+import sqlalchemy as sa
+from flask import jsonify
+from datagen import build
+from app import db
+from app.models import Payment
+from app.main import serializers
+from app.main.serializers import PAYMENT_COLUMNS, payment_to_dict, json_response
+
+
+def orm_path(query):
+    payments = db.session.scalars(query).all()
+    body = jsonify({"payments": [{
+        "id": p.id,
+        "payment_name": p.payment_name,
+        "description": p.description,
+        "amount": float(p.amount),
+        "category": p.category,
+        "deadline": p.deadline.isoformat(),
+        "status": p.status,
+    } for p in payments]}).get_data()
+    db.session.expunge_all()
+    return body
+
+
+def row_path(query):
+    rows = db.session.execute(query).all()
+    return json_response({"payments": [payment_to_dict(row) for row in rows]}).get_data()
+
+
+def stdlib_row_path(query):
+    rows = db.session.execute(query).all()
+    return json.dumps({"payments": [payment_to_dict(row) for row in rows]}).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    app = build(os.path.join(tempfile.mkdtemp(), "bench.db"), 1, args.rows)
+    with app.app_context(), app.test_request_context():
+        orm_query = sa.select(Payment).order_by(Payment.deadline).limit(args.rows)
+        row_query = sa.select(*PAYMENT_COLUMNS).order_by(Payment.deadline).limit(args.rows)
+
+        cases = [
+            ("ORM objects + jsonify", lambda: orm_path(orm_query)),
+            ("column rows + stdlib json", lambda: stdlib_row_path(row_query)),
+            (f"column rows + {'orjson' if serializers.orjson else 'stdlib json'} (shared serializer)",
+             lambda: row_path(row_query)),
+        ]
+        print(f"{args.rows}-row page, best of 5 x {args.repeat} runs")
+        for label, fn in cases:
+            fn()
+            best = min(timeit.repeat(fn, number=args.repeat, repeat=5)) / args.repeat
+            print(f"  {best * 1e6 / args.rows:7.2f} us/row  {best * 1e3:6.2f} ms/page  {label}")
+
+
+if __name__ == "__main__":
+    main()
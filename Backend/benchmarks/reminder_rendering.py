@@ -0,0 +1,91 @@
+"""Reminder rendering throughput in messages per second.
+
+Compares Flask's render_template (needs an app context, re-formats every
+field per call) with the precompiled ReminderRenderer inline and fanned out
+over a RenderPool of worker processes. Each message is one email (HTML and
+text parts) for a single payment.
+
+    python benchmarks/reminder_rendering.py --messages 20000 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from flask import render_template
+from datagen import bench_config, email_for, generate_payments
+from app import create_app
+from app.cron.rendering import ReminderRenderer, RenderPool, format_amount, format_deadline
+
+
+def make_messages(count):
+    # One payment for each of ``count`` users
+    now = datetime.now()
+    messages = []
+    for i, payment in enumerate(generate_payments(count, 1)):
+        deadline, amount = payment["deadline"], payment["amount"]
+        messages.append([{
+            "payment_id": i,
+            "user_id": payment["user_id"],
+            "email": email_for(payment["user_id"]),
+            "raw": (amount, deadline),
+            "context": {
+                "payment_name": payment["payment_name"],
+                "amount": format_amount(amount),
+                "deadline": format_deadline(deadline.date()),
+                "overdue": deadline <= now,
+            },
+        }])
+    return messages
+
+
+def flask_path(messages):
+    for message in messages:
+        amount, deadline = message[0]["raw"]
+        context = {
+            "amount": amount,
+            "deadline": deadline.strftime("%B %d, %Y"),
+            "overdue": datetime.now().date() > deadline.date(),
+        }
+        render_template("reminder_mail.html", **context)
+        render_template("reminder.txt", **context)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    app = create_app(bench_config(os.path.join(tempfile.mkdtemp(), "bench.db")))
+    messages = make_messages(args.messages)
+    renderer = ReminderRenderer()
+
+    def inline():
+        for message in messages:
+            renderer.email(message)
+
+    def pooled(pool):
+        pool.render("email", messages)
+
+    with app.app_context(), RenderPool(args.workers, min_parallel=1) as pool:
+        # Warm the template caches and start the workers outside the timings
+        flask_path(messages[:10])
+        pooled(pool)
+
+        cases = [
+            ("render_template in app context", lambda: flask_path(messages)),
+            ("precompiled ReminderRenderer, inline", inline),
+            (f"RenderPool, {args.workers} processes", lambda: pooled(pool)),
+        ]
+        print(f"{args.messages} single-payment emails")
+        for label, fn in cases:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            print(f"  {args.messages / elapsed:10.0f} messages/s  {label}")
+
+
+if __name__ == "__main__":
+    main()
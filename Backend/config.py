@@ -8,6 +8,13 @@ from dotenv import load_dotenv
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'this_is_the_key'
     RATELIMIT_DEFAULT = "50000 per minute"
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+    PAYMENT_BULK_MAX_ITEMS = int(os.getenv("PAYMENT_BULK_MAX_ITEMS", 500))
+
+    LISTING_CACHE_BACKEND = os.getenv("LISTING_CACHE_BACKEND", "memory")  # memory, sqlite, redis or none
+    LISTING_CACHE_URL = os.getenv("LISTING_CACHE_URL")
+    LISTING_CACHE_TTL = int(os.getenv("LISTING_CACHE_TTL", 60))
+    LISTING_CACHE_MAX_ENTRIES = int(os.getenv("LISTING_CACHE_MAX_ENTRIES", 1024))
     
     # Make sure DB path is absolute and consistent
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
@@ -18,12 +25,22 @@ class Config:
     
     RESEND_API_KEY = os.getenv("RESEND_API_KEY")
     RESEND_SENDER = os.getenv("RESEND_SENDER")
+    EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "smtp")  # smtp or resend, used for reminder runs
 
     EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
     EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
     EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True").lower() == "true"
     EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
     EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+    EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", 4))
+    EMAIL_POOL_IDLE_TIMEOUT = int(os.getenv("EMAIL_POOL_IDLE_TIMEOUT", 60))
+    EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", 10))
+
+    OTP_STORE_BACKEND = os.getenv("OTP_STORE_BACKEND", "memory")  # memory, sqlite or redis
+    OTP_STORE_URL = os.getenv("OTP_STORE_URL")
+    OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", 300))
+    OTP_DISPATCH_WORKERS = int(os.getenv("OTP_DISPATCH_WORKERS", 4))
+    OTP_DISPATCH_QUEUE_SIZE = int(os.getenv("OTP_DISPATCH_QUEUE_SIZE", 100))
 
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "default-flask-secret")
     JWT_TOKEN_LOCATION = ["headers"] 
@@ -34,4 +51,48 @@ class Config:
         "url": os.getenv("SMS_GATEWAY_URL"),
         "username": os.getenv("SMS_GATEWAY_USER"),
         "password": os.getenv("SMS_GATEWAY_PASS")
-    }
\ No newline at end of file
+    }
+    SMS_TIMEOUT = int(os.getenv("SMS_TIMEOUT", 5))
+    SMS_MAX_RETRIES = int(os.getenv("SMS_MAX_RETRIES", 3))
+    SMS_POOL_CONNECTIONS = int(os.getenv("SMS_POOL_CONNECTIONS", 2))
+    SMS_POOL_MAXSIZE = int(os.getenv("SMS_POOL_MAXSIZE", 10))
+    SMS_BATCH_SIZE = int(os.getenv("SMS_BATCH_SIZE", 100))
+
+    # Reminder rendering fans out to this many processes for large batches, 0 renders inline
+    REMINDER_RENDER_WORKERS = int(os.getenv("REMINDER_RENDER_WORKERS", 0))
+    REMINDER_RENDER_MIN_PARALLEL = int(os.getenv("REMINDER_RENDER_MIN_PARALLEL", 200))
+
+    # flask cron scheduler: how far past the reminder lead time deadlines are
+    # held in memory, and how often the payment change feed is polled
+    SCHEDULER_LOOKAHEAD_HOURS = int(os.getenv("SCHEDULER_LOOKAHEAD_HOURS", 24))
+    SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", 5))
+    SCHEDULER_GAP_SECONDS = float(os.getenv("SCHEDULER_GAP_SECONDS", 300))
+
+    # Reminder delivery: worker threads per channel, provider quotas as
+    # calls per second with a burst allowance, and retry backoff in seconds.
+    # Keep DELIVERY_EMAIL_WORKERS at or below EMAIL_POOL_SIZE for SMTP.
+    DELIVERY_EMAIL_WORKERS = int(os.getenv("DELIVERY_EMAIL_WORKERS", 4))
+    DELIVERY_SMS_WORKERS = int(os.getenv("DELIVERY_SMS_WORKERS", 4))
+    SMTP_RATE_PER_SECOND = float(os.getenv("SMTP_RATE_PER_SECOND", 10))
+    SMTP_BURST = int(os.getenv("SMTP_BURST", 20))
+    RESEND_RATE_PER_SECOND = float(os.getenv("RESEND_RATE_PER_SECOND", 2))
+    RESEND_BURST = int(os.getenv("RESEND_BURST", 2))
+    SMS_RATE_PER_SECOND = float(os.getenv("SMS_RATE_PER_SECOND", 5))
+    SMS_BURST = int(os.getenv("SMS_BURST", 10))
+    DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", 4))
+    DELIVERY_BACKOFF_BASE = float(os.getenv("DELIVERY_BACKOFF_BASE", 0.5))
+    DELIVERY_BACKOFF_MAX = float(os.getenv("DELIVERY_BACKOFF_MAX", 30))
+
+    # Queue OTP and reminder messages in the outbox table instead of sending
+    # them inline; flask outbox drain delivers them
+    OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "false").lower() == "true"
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 300))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+    OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", 30))
+    OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", 1))
+
+    # Prometheus metrics at METRICS_PATH; the endpoint has no auth, so keep
+    # it off the public proxy
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
\ No newline at end of file
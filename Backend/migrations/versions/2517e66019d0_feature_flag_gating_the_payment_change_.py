@@ -0,0 +1,120 @@
+"""Feature flag gating the payment change feed
+
+Revision ID: 2517e66019d0
+Revises: 3c7c3ac96289
+Create Date: 2026-10-18 14:01:57.565034
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2517e66019d0'
+down_revision = '3c7c3ac96289'
+branch_labels = None
+depends_on = None
+
+
+FEED_ON = "EXISTS (SELECT 1 FROM feature_flag WHERE name = 'change_feed' AND enabled)"
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER payment_change_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_change (payment_id)
+        SELECT NEW.id WHERE {FEED_ON};
+    END
+    """,
+    f"""
+    CREATE TRIGGER payment_change_update AFTER UPDATE OF user_id, deadline, status ON payment
+    WHEN NEW.deadline IS NOT OLD.deadline OR NEW.user_id IS NOT OLD.user_id
+        OR (NEW.status IN ('pending', 'overdue')) != (OLD.status IN ('pending', 'overdue'))
+    BEGIN
+        INSERT INTO payment_change (payment_id)
+        SELECT NEW.id WHERE {FEED_ON};
+    END
+    """,
+    f"""
+    CREATE TRIGGER payment_change_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_change (payment_id)
+        SELECT OLD.id WHERE {FEED_ON};
+    END
+    """,
+]
+
+OLD_SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_change_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_change (payment_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_change_update AFTER UPDATE OF user_id, deadline, status ON payment
+    WHEN NEW.deadline IS NOT OLD.deadline OR NEW.user_id IS NOT OLD.user_id
+        OR (NEW.status IN ('pending', 'overdue')) != (OLD.status IN ('pending', 'overdue'))
+    BEGIN
+        INSERT INTO payment_change (payment_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_change_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_change (payment_id) VALUES (OLD.id);
+    END
+    """,
+]
+
+POSTGRES_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION payment_change_log() RETURNS trigger AS $$
+    BEGIN
+        IF {FEED_ON} THEN
+            INSERT INTO payment_change (payment_id)
+            VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """
+
+OLD_POSTGRES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION payment_change_log() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO payment_change (payment_id)
+        VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """
+
+
+def _replace_triggers(sqlite_triggers, postgres_function):
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_change_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_change_update")
+        op.execute("DROP TRIGGER IF EXISTS payment_change_delete")
+        for statement in sqlite_triggers:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute(postgres_function)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('feature_flag',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('enabled', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # ### end Alembic commands ###
+
+    # The feed starts off; whatever piled up while nothing read it goes
+    _replace_triggers(SQLITE_TRIGGERS, POSTGRES_FUNCTION)
+    op.execute("DELETE FROM payment_change")
+
+
+def downgrade():
+    _replace_triggers(OLD_SQLITE_TRIGGERS, OLD_POSTGRES_FUNCTION)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('feature_flag')
+    # ### end Alembic commands ###
@@ -0,0 +1,93 @@
+"""Per-user payment data versions for listing ETags
+
+Revision ID: 2c6f83a1d0e7
+Revises: b71c0e4f9a58
+Create Date: 2026-10-18 11:26:09.774153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c6f83a1d0e7'
+down_revision = 'b71c0e4f9a58'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_version_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version) VALUES (NEW.user_id, 1), (0, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_version_update AFTER UPDATE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version) VALUES (OLD.user_id, 1), (0, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT NEW.user_id, 1 WHERE NEW.user_id != OLD.user_id
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_version_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version) VALUES (OLD.user_id, 1), (0, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION payment_version_bump() RETURNS trigger AS $$
+    DECLARE
+        scopes integer[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            scopes := ARRAY[NEW.user_id, 0];
+        ELSIF TG_OP = 'DELETE' OR NEW.user_id = OLD.user_id THEN
+            scopes := ARRAY[OLD.user_id, 0];
+        ELSE
+            scopes := ARRAY[OLD.user_id, NEW.user_id, 0];
+        END IF;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT scope, 1 FROM unnest(scopes) AS scope
+        ON CONFLICT (scope_id) DO UPDATE SET version = payment_version.version + 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_version_bump()
+    """,
+]
+
+
+def upgrade():
+    op.create_table('payment_version',
+    sa.Column('scope_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope_id')
+    )
+
+    dialect = op.get_bind().dialect.name
+    for statement in SQLITE_TRIGGERS if dialect == 'sqlite' else POSTGRES_TRIGGERS if dialect == 'postgresql' else []:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_version_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_version_update")
+        op.execute("DROP TRIGGER IF EXISTS payment_version_delete")
+    elif dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS payment_version_trigger ON payment")
+        op.execute("DROP FUNCTION IF EXISTS payment_version_bump()")
+
+    op.drop_table('payment_version')
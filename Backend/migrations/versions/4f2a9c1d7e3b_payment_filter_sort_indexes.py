@@ -0,0 +1,38 @@
+"""Payment filter/sort indexes
+
+Revision ID: 4f2a9c1d7e3b
+Revises: cc9547a962cd
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a9c1d7e3b'
+down_revision = 'cc9547a962cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_deadline_status', ['deadline', 'status'], unique=False)
+        batch_op.create_index('ix_payment_status_deadline', ['status', 'deadline'], unique=False)
+        batch_op.create_index('ix_payment_category_deadline', ['category', 'deadline'], unique=False)
+        batch_op.create_index('ix_payment_user_id_deadline', ['user_id', 'deadline'], unique=False)
+        batch_op.create_index('ix_payment_user_id_status_deadline', ['user_id', 'status', 'deadline'], unique=False)
+        batch_op.create_index('ix_payment_amount', ['amount'], unique=False)
+        batch_op.create_index('ix_payment_payment_name', ['payment_name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_payment_name')
+        batch_op.drop_index('ix_payment_amount')
+        batch_op.drop_index('ix_payment_user_id_status_deadline')
+        batch_op.drop_index('ix_payment_user_id_deadline')
+        batch_op.drop_index('ix_payment_category_deadline')
+        batch_op.drop_index('ix_payment_status_deadline')
+        batch_op.drop_index('ix_payment_deadline_status')
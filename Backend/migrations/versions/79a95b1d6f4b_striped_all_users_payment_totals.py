@@ -0,0 +1,118 @@
+"""Striped all users payment totals
+
+Revision ID: 79a95b1d6f4b
+Revises: b64f083d98b1
+Create Date: 2026-10-18 14:07:56.494200
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79a95b1d6f4b'
+down_revision = 'b64f083d98b1'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_total_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_total (stripe, status, category, payment_count, amount_total)
+        VALUES (NEW.user_id % 16, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (stripe, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_total_delete AFTER DELETE ON payment BEGIN
+        UPDATE payment_total SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE stripe = OLD.user_id % 16 AND status = OLD.status AND category = OLD.category;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_total_update AFTER UPDATE OF user_id, status, category, amount ON payment BEGIN
+        UPDATE payment_total SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE stripe = OLD.user_id % 16 AND status = OLD.status AND category = OLD.category;
+        INSERT INTO payment_total (stripe, status, category, payment_count, amount_total)
+        VALUES (NEW.user_id % 16, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (stripe, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION payment_total_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE payment_total SET
+                payment_count = payment_count - 1,
+                amount_total = amount_total - OLD.amount
+            WHERE stripe = OLD.user_id % 16
+                AND status = OLD.status::text AND category = OLD.category::text;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO payment_total (stripe, status, category, payment_count, amount_total)
+            VALUES (NEW.user_id % 16, NEW.status::text, NEW.category::text, 1, NEW.amount)
+            ON CONFLICT (stripe, status, category) DO UPDATE SET
+                payment_count = payment_total.payment_count + 1,
+                amount_total = payment_total.amount_total + EXCLUDED.amount_total;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_total_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, status, category, amount ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_total_apply()
+    """,
+]
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('payment_total',
+    sa.Column('stripe', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('category', sa.String(length=20), nullable=False),
+    sa.Column('payment_count', sa.Integer(), nullable=False),
+    sa.Column('amount_total', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('stripe', 'status', 'category')
+    )
+    # ### end Alembic commands ###
+
+    dialect = op.get_bind().dialect.name
+    for statement in SQLITE_TRIGGERS if dialect == 'sqlite' else POSTGRES_TRIGGERS if dialect == 'postgresql' else []:
+        op.execute(statement)
+
+    # Backfill from the per-user counters
+    op.execute(
+        "INSERT INTO payment_total (stripe, status, category, payment_count, amount_total) "
+        "SELECT user_id % 16, status, category, SUM(payment_count), SUM(amount_total) "
+        "FROM payment_summary GROUP BY user_id % 16, status, category"
+    )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_total_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_total_delete")
+        op.execute("DROP TRIGGER IF EXISTS payment_total_update")
+    elif dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS payment_total_trigger ON payment")
+        op.execute("DROP FUNCTION IF EXISTS payment_total_apply()")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('payment_total')
+    # ### end Alembic commands ###
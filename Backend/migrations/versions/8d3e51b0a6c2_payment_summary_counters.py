@@ -0,0 +1,114 @@
+"""Per-user payment summary counters
+
+Revision ID: 8d3e51b0a6c2
+Revises: 4f2a9c1d7e3b
+Create Date: 2026-10-18 10:03:17.592441
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3e51b0a6c2'
+down_revision = '4f2a9c1d7e3b'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_summary_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total)
+        VALUES (NEW.user_id, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (user_id, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_summary_delete AFTER DELETE ON payment BEGIN
+        UPDATE payment_summary SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE user_id = OLD.user_id AND status = OLD.status AND category = OLD.category;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_summary_update AFTER UPDATE OF user_id, status, category, amount ON payment BEGIN
+        UPDATE payment_summary SET
+            payment_count = payment_count - 1,
+            amount_total = amount_total - OLD.amount
+        WHERE user_id = OLD.user_id AND status = OLD.status AND category = OLD.category;
+        INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total)
+        VALUES (NEW.user_id, NEW.status, NEW.category, 1, NEW.amount)
+        ON CONFLICT (user_id, status, category) DO UPDATE SET
+            payment_count = payment_count + 1,
+            amount_total = amount_total + excluded.amount_total;
+    END
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION payment_summary_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE payment_summary SET
+                payment_count = payment_count - 1,
+                amount_total = amount_total - OLD.amount
+            WHERE user_id = OLD.user_id AND status = OLD.status::text AND category = OLD.category::text;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total)
+            VALUES (NEW.user_id, NEW.status::text, NEW.category::text, 1, NEW.amount)
+            ON CONFLICT (user_id, status, category) DO UPDATE SET
+                payment_count = payment_summary.payment_count + 1,
+                amount_total = payment_summary.amount_total + EXCLUDED.amount_total;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_summary_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, status, category, amount ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_summary_apply()
+    """,
+]
+
+
+def upgrade():
+    op.create_table('payment_summary',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('category', sa.String(length=20), nullable=False),
+    sa.Column('payment_count', sa.Integer(), nullable=False),
+    sa.Column('amount_total', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'status', 'category')
+    )
+
+    dialect = op.get_bind().dialect.name
+    for statement in SQLITE_TRIGGERS if dialect == 'sqlite' else POSTGRES_TRIGGERS if dialect == 'postgresql' else []:
+        op.execute(statement)
+
+    # Backfill from existing payments
+    op.execute(
+        "INSERT INTO payment_summary (user_id, status, category, payment_count, amount_total) "
+        "SELECT user_id, CAST(status AS VARCHAR(20)), CAST(category AS VARCHAR(20)), COUNT(*), SUM(amount) "
+        "FROM payment GROUP BY user_id, status, category"
+    )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_summary_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_summary_delete")
+        op.execute("DROP TRIGGER IF EXISTS payment_summary_update")
+    elif dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS payment_summary_trigger ON payment")
+        op.execute("DROP FUNCTION IF EXISTS payment_summary_apply()")
+
+    op.drop_table('payment_summary')
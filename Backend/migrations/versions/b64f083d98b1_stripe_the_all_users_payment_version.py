@@ -0,0 +1,136 @@
+"""Stripe the all users payment version
+
+Revision ID: b64f083d98b1
+Revises: 5c2648cf5fc2
+Create Date: 2026-10-18 14:05:49.084381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b64f083d98b1'
+down_revision = '5c2648cf5fc2'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_version_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version)
+        VALUES (NEW.user_id, 1), (-1 - NEW.user_id % 16, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_version_update AFTER UPDATE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version)
+        VALUES (OLD.user_id, 1), (-1 - OLD.user_id % 16, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT NEW.user_id, 1 WHERE NEW.user_id != OLD.user_id
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_version_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version)
+        VALUES (OLD.user_id, 1), (-1 - OLD.user_id % 16, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+]
+
+OLD_SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_version_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version) VALUES (NEW.user_id, 1), (0, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_version_update AFTER UPDATE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version) VALUES (OLD.user_id, 1), (0, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT NEW.user_id, 1 WHERE NEW.user_id != OLD.user_id
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER payment_version_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_version (scope_id, version) VALUES (OLD.user_id, 1), (0, 1)
+        ON CONFLICT (scope_id) DO UPDATE SET version = version + 1;
+    END
+    """,
+]
+
+POSTGRES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION payment_version_bump() RETURNS trigger AS $$
+    DECLARE
+        scopes integer[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            scopes := ARRAY[NEW.user_id, -1 - NEW.user_id % 16];
+        ELSIF TG_OP = 'DELETE' OR NEW.user_id = OLD.user_id THEN
+            scopes := ARRAY[OLD.user_id, -1 - OLD.user_id % 16];
+        ELSE
+            scopes := ARRAY[OLD.user_id, NEW.user_id, -1 - OLD.user_id % 16];
+        END IF;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT scope, 1 FROM unnest(scopes) AS scope
+        ON CONFLICT (scope_id) DO UPDATE SET version = payment_version.version + 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """
+
+OLD_POSTGRES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION payment_version_bump() RETURNS trigger AS $$
+    DECLARE
+        scopes integer[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            scopes := ARRAY[NEW.user_id, 0];
+        ELSIF TG_OP = 'DELETE' OR NEW.user_id = OLD.user_id THEN
+            scopes := ARRAY[OLD.user_id, 0];
+        ELSE
+            scopes := ARRAY[OLD.user_id, NEW.user_id, 0];
+        END IF;
+        INSERT INTO payment_version (scope_id, version)
+        SELECT scope, 1 FROM unnest(scopes) AS scope
+        ON CONFLICT (scope_id) DO UPDATE SET version = payment_version.version + 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """
+
+
+def _replace_triggers(sqlite_triggers, postgres_function):
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_version_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_version_update")
+        op.execute("DROP TRIGGER IF EXISTS payment_version_delete")
+        for statement in sqlite_triggers:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute(postgres_function)
+
+
+def upgrade():
+    _replace_triggers(SQLITE_TRIGGERS, POSTGRES_FUNCTION)
+    # Carry the old all users version into the first stripe so the summed
+    # version never falls back to an ETag clients may still hold
+    op.execute("INSERT INTO payment_version (scope_id, version) "
+               "SELECT -1, version FROM payment_version WHERE scope_id = 0")
+    op.execute("DELETE FROM payment_version WHERE scope_id = 0")
+
+
+def downgrade():
+    _replace_triggers(OLD_SQLITE_TRIGGERS, OLD_POSTGRES_FUNCTION)
+    op.execute("INSERT INTO payment_version (scope_id, version) "
+               "SELECT 0, sum(version) FROM payment_version WHERE scope_id < 0 HAVING count(*) > 0")
+    op.execute("DELETE FROM payment_version WHERE scope_id < 0")
@@ -0,0 +1,74 @@
+"""Full-text search index on payments
+
+Revision ID: b71c0e4f9a58
+Revises: 8d3e51b0a6c2
+Create Date: 2026-10-18 10:41:52.208716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71c0e4f9a58'
+down_revision = '8d3e51b0a6c2'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE payment_fts USING fts5(
+        payment_name, description, content='payment', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER payment_fts_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_fts (rowid, payment_name, description)
+        VALUES (NEW.id, NEW.payment_name, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_fts_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_fts (payment_fts, rowid, payment_name, description)
+        VALUES ('delete', OLD.id, OLD.payment_name, OLD.description);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_fts_update AFTER UPDATE OF payment_name, description ON payment BEGIN
+        INSERT INTO payment_fts (payment_fts, rowid, payment_name, description)
+        VALUES ('delete', OLD.id, OLD.payment_name, OLD.description);
+        INSERT INTO payment_fts (rowid, payment_name, description)
+        VALUES (NEW.id, NEW.payment_name, NEW.description);
+    END
+    """,
+    # Index rows that existed before the table was created
+    "INSERT INTO payment_fts (payment_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE payment ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(payment_name, '') || ' ' || coalesce(description, ''))
+    ) STORED
+    """,
+    "CREATE INDEX ix_payment_search_vector ON payment USING GIN (search_vector)",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in SQLITE_DDL if dialect == 'sqlite' else POSTGRES_DDL if dialect == 'postgresql' else []:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_fts_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS payment_fts_update")
+        op.execute("DROP TABLE IF EXISTS payment_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_payment_search_vector")
+        op.execute("ALTER TABLE payment DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,91 @@
+"""Payment change feed for the reminder scheduler
+
+Revision ID: e6f471522f08
+Revises: a244bf567d87
+Create Date: 2026-10-18 13:14:56.104006
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f471522f08'
+down_revision = 'a244bf567d87'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER payment_change_insert AFTER INSERT ON payment BEGIN
+        INSERT INTO payment_change (payment_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_change_update AFTER UPDATE OF user_id, deadline, status ON payment
+    WHEN NEW.deadline IS NOT OLD.deadline OR NEW.user_id IS NOT OLD.user_id
+        OR (NEW.status IN ('pending', 'overdue')) != (OLD.status IN ('pending', 'overdue'))
+    BEGIN
+        INSERT INTO payment_change (payment_id) VALUES (NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER payment_change_delete AFTER DELETE ON payment BEGIN
+        INSERT INTO payment_change (payment_id) VALUES (OLD.id);
+    END
+    """,
+]
+
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION payment_change_log() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO payment_change (payment_id)
+        VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER payment_change_write_trigger
+    AFTER INSERT OR DELETE ON payment
+    FOR EACH ROW EXECUTE FUNCTION payment_change_log()
+    """,
+    """
+    CREATE TRIGGER payment_change_update_trigger
+    AFTER UPDATE OF user_id, deadline, status ON payment
+    FOR EACH ROW WHEN (
+        NEW.deadline IS DISTINCT FROM OLD.deadline OR NEW.user_id IS DISTINCT FROM OLD.user_id
+        OR (NEW.status IN ('pending', 'overdue')) <> (OLD.status IN ('pending', 'overdue'))
+    )
+    EXECUTE FUNCTION payment_change_log()
+    """,
+]
+
+
+def upgrade():
+    op.create_table('payment_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+
+    dialect = op.get_bind().dialect.name
+    for statement in SQLITE_TRIGGERS if dialect == 'sqlite' else POSTGRES_TRIGGERS if dialect == 'postgresql' else []:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS payment_change_insert")
+        op.execute("DROP TRIGGER IF EXISTS payment_change_update")
+        op.execute("DROP TRIGGER IF EXISTS payment_change_delete")
+    elif dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS payment_change_write_trigger ON payment")
+        op.execute("DROP TRIGGER IF EXISTS payment_change_update_trigger ON payment")
+        op.execute("DROP FUNCTION IF EXISTS payment_change_log()")
+
+    op.drop_table('payment_change')